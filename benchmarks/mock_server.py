@@ -0,0 +1,485 @@
+"""Local stand-in for the NCHU Portal SSO and ACAD system
+
+Replays the recorded (anonymized) pages under ``fixtures/`` with just enough
+state to walk every flow of ``nchu.Student`` offline.
+"""
+import argparse
+import threading
+from hashlib import md5
+from http import cookies
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from string import Template
+from time import sleep
+from urllib import parse
+from uuid import uuid4
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+USERNAME = "4107056000"
+PASSWORD = "password"
+
+COURSES = {
+    # code: (name, teacher, capacity, selected, area)
+    "0348": ("古典音樂賞析(一)", "王老師", 60, 60, "GE0"),
+    "0349": ("古典音樂賞析(二)", "王老師", 60, 59, "GE0"),
+    "0412": ("台灣史", "林老師", 80, 80, "GE0"),
+    "0415": ("經濟學概論", "陳老師", 120, 100, "GE1"),
+    "0433": ("社會學", "張老師", 90, 90, "GE1"),
+    "0501": ("天文學導論", "李老師", 100, 12, "GE2"),
+    "0502": ("生命科學", "黃老師", 100, 100, "GE2"),
+    "1159": ("Python 程式設計", "吳老師", 40, 40, "DEPT"),
+    "1160": ("資料結構", "周老師", 70, 70, "DEPT"),
+    "1161": ("演算法", "周老師", 70, 10, "DEPT"),
+}
+CONFLICTS = {frozenset({"0349", "0501"})}
+
+QUESTIONNAIRES = {
+    # code: (name, teacher)
+    "1160": ("資料結構", "周老師"),
+    "1161": ("演算法", "周老師"),
+    "0348": ("古典音樂賞析(一)", "王老師"),
+}
+TA_QUESTIONNAIRES = {
+    # code: [ta names]
+    "1160": ["助教甲", "助教乙"],
+    "1161": ["助教丙"],
+}
+
+
+def fixture(name):
+    return Template((FIXTURES / f"{name}.html").read_text(encoding="utf-8"))
+
+
+def filler_courses(count):
+    """Extra GE courses, to bring the course lists up to a realistic size"""
+    return {
+        f"{2000 + index:04d}": (
+            f"通識課程{index}",
+            "助理教授",
+            50,
+            index % 51,
+            f"GE{index % 3}",
+        )
+        for index in range(count)
+    }
+
+
+class State:
+    def __init__(self, courses=0):
+        self.lock = threading.Lock()
+        self.courses = {
+            code: list(info)
+            for code, info in {**COURSES, **filler_courses(courses)}.items()
+        }
+        self.enrolled = {"0348", "1160"}
+        self.ques_done = set()
+        self.ta_done = set()
+        self.sessions = set()
+        self.logins = 0
+        # End earlier sessions on every login, as ACAD may do
+        self.exclusive = False
+        self.closed = set()
+        # Page name to seconds to hold back its answer, after acting on it
+        self.stalled = {}
+        # Page name to HTTP status to answer with, after acting on it
+        self.failing = {}
+        self.requests = 0
+
+    @staticmethod
+    def secret(code):
+        return f"S{code}X{sum(map(ord, code)) * 7919:08d}"
+
+    def code_of(self, secret):
+        for code in self.courses:
+            if self.secret(code) == secret:
+                return code
+        return None
+
+    def enroll(self, code):
+        if code is None or code not in self.courses:
+            return "查無此選課號碼"
+        course = self.courses[code]
+        if code in self.enrolled:
+            return "已選過此課程，加選失敗"
+        if any({code, other} in CONFLICTS for other in self.enrolled):
+            return "上課時間衝堂，加選失敗"
+        if course[3] >= course[2]:
+            return "選課人數已額滿，加選失敗"
+        course[3] += 1
+        self.enrolled.add(code)
+        return "加選成功"
+
+    def drop(self, code):
+        if code not in self.enrolled:
+            return "未選此課程，退選失敗"
+        self.enrolled.discard(code)
+        self.courses[code][3] -= 1
+        return "退選成功"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without this every keep-alive
+    # response waits out a delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+    server_version = "Oracle-Application-Server-10g"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    @property
+    def base(self):
+        return f"http://{self.headers['Host']}"
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        return parse.parse_qs(body, keep_blank_values=True)
+
+    def _query(self):
+        return parse.parse_qs(parse.urlparse(self.path).query)
+
+    def _cookie(self, name):
+        jar = cookies.SimpleCookie(self.headers.get("Cookie", ""))
+        return jar[name].value if name in jar else None
+
+    def _send(self, body, status=200, set_cookie=None):
+        data = body.encode("utf-8")
+        etag = None
+        if self.server.etag and status == 200:
+            etag = f'"{md5(data).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        if set_cookie:
+            self.send_header("Set-Cookie", set_cookie)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _render(self, page, **kwargs):
+        kwargs.setdefault("base", self.base)
+        kwargs.setdefault("username", USERNAME)
+        return fixture(page).substitute(**kwargs)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        path = parse.urlparse(self.path).path
+        if path == "/_requests":
+            # Requests served so far, for benchmarks running the server in
+            # another process
+            return self._send(str(self.state.requests))
+        with self.state.lock:
+            self.state.requests += 1
+        if self.server.latency:
+            sleep(self.server.latency)
+        form = self._form() if method == "POST" else self._query()
+        if path == "/":
+            return self._send(self._render("portal"))
+        if path == "/nidp/app/login":
+            if "id" in self._query():
+                return self._send(self._render("sso_entry"))
+            user = form.get("Ecom_User_ID", [""])[0]
+            password = form.get("Ecom_Password", [""])[0]
+            if (user, password) != (USERNAME, PASSWORD):
+                return self._send(self._render("sso_failed"))
+            return self._send(
+                self._render("sso_login"), set_cookie="IPCZQX=sso; Path=/"
+            )
+        name = path.rsplit("/", 1)[-1]
+        if name == "ACAD_PASSCHK":
+            user = form.get("v_emp", [""])[0]
+            password = form.get("v_pwd", [""])[0]
+            if (user, password) != (USERNAME, PASSWORD):
+                return self._send(self._render("expired"))
+            token = uuid4().hex
+            with self.state.lock:
+                if self.state.exclusive:
+                    self.state.sessions.clear()
+                self.state.sessions.add(token)
+                self.state.logins += 1
+            return self._send(
+                self._render("login"), set_cookie=f"ACADSESSION={token}; Path=/"
+            )
+        if self._cookie("ACADSESSION") not in self.state.sessions:
+            return self._send(self._render("expired"))
+        if name in self.state.closed:
+            return self._send(self._render("closed"))
+        handler = getattr(self, f"page_{name}", None)
+        if handler is None:
+            return self._send("Not Found", status=404)
+        with self.state.lock:
+            body = handler(form)
+        if name in self.state.stalled:
+            sleep(self.state.stalled[name])
+        return self._send(body, status=self.state.failing.get(name, 200))
+
+    #
+    # Pages
+    #
+
+    def page_studframe_left(self, form):
+        return self._render("sidebar")
+
+    def page_acad_home(self, form):
+        return self._render("sidebar")
+
+    def page_Stud_Question_Main1(self, form):
+        row = fixture("ques_list_row")
+        rows = "".join(
+            row.substitute(
+                code=code,
+                name=name,
+                teacher=teacher,
+                done='<IMG src="/img/ok.gif">' if code in self.state.ques_done else "",
+            )
+            for code, (name, teacher) in QUESTIONNAIRES.items()
+        )
+        return self._render("ques_list", rows=rows)
+
+    def page_Stud_Question_Fill2(self, form):
+        code = form["v_serial"][0]
+        name, teacher = QUESTIONNAIRES[code]
+        return self._render("ques_fill", code=code, name=name, teacher=teacher)
+
+    def page_Stud_Question_Conf3(self, form):
+        code = form["v_serial"][0]
+        hiddens = "\n".join(
+            f'<INPUT type="hidden" name="{key}" value="{values[0]}">'
+            for key, values in form.items()
+        )
+        return self._render(
+            "ques_confirm", name=QUESTIONNAIRES[code][0], hiddens=hiddens
+        )
+
+    def page_Stud_Question_Dml4(self, form):
+        self.state.ques_done.add(form["v_serial"][0])
+        return self._render("ques_final")
+
+    def page_ta_ques_stu(self, form):
+        row, ta_form = fixture("ques_ta_list_row"), fixture("ques_ta_list_form")
+        rows = []
+        for code, tas in TA_QUESTIONNAIRES.items():
+            name, teacher = QUESTIONNAIRES[code]
+            forms = "".join(
+                ta_form.substitute(
+                    code=code,
+                    name=name,
+                    teacher=teacher,
+                    ta=ta,
+                    status="已填寫" if (code, ta) in self.state.ta_done else "未填寫",
+                )
+                for ta in tas
+            )
+            rows.append(
+                row.substitute(code=code, name=name, teacher=teacher, forms=forms)
+            )
+        return self._render("ques_ta_list", rows="".join(rows))
+
+    def page_ta_ques_stu_des(self, form):
+        code, ta = form["v_scrd_serial_no"][0], form["v_ta"][0]
+        return self._render("ques_ta_fill", code=code, ta=ta)
+
+    def page_ta_ques_stu_des_udt(self, form):
+        code, ta = form["v_scrd_serial_no"][0], form["v_ta"][0]
+        self.state.ta_done.add((code, ta))
+        return self._render("ques_ta_send", ta=ta)
+
+    def _course_rows(self, codes, field):
+        row = fixture("course_row")
+        return "".join(
+            row.substitute(
+                field=field,
+                secret=self.state.secret(code),
+                code=code,
+                name=self.state.courses[code][0],
+                teacher=self.state.courses[code][1],
+                capacity=self.state.courses[code][2],
+                selected=self.state.courses[code][3],
+                area=self.state.courses[code][4],
+            )
+            for code in codes
+        )
+
+    def _result_rows(self, results):
+        row = fixture("result_row")
+        return "".join(
+            row.substitute(
+                code=code,
+                name=self.state.courses.get(code, ("",))[0],
+                teacher=self.state.courses.get(code, ("", ""))[1],
+                message=message,
+            )
+            for code, message in results
+        )
+
+    def page_gned_main(self, form):
+        return self._render("ge_entry")
+
+    def page_gned_add1_workflow(self, form):
+        return self._render("ge_select")
+
+    def page_gned_add2_list(self, form):
+        areas = {}
+        for code, course in self.state.courses.items():
+            areas.setdefault(course[4], []).append(code)
+        return self._render(
+            "ge_list",
+            **{
+                f"rows_{index}": self._course_rows(
+                    areas.get(f"GE{index}", []), "v_click"
+                )
+                for index in range(3)
+            },
+        )
+
+    def page_gned_add3_check(self, form):
+        code = self.state.code_of(form["v_click"][0])
+        return self._render(
+            "ge_check",
+            code=code,
+            name=self.state.courses[code][0],
+            confirm="C" + form["v_click"][0],
+        )
+
+    def page_gned_add4_dml(self, form):
+        code = self.state.code_of(form["v_click"][0][1:])
+        return self._render(
+            "ge_final",
+            code=code,
+            name=self.state.courses[code][0],
+            message=self.state.enroll(code),
+        )
+
+    def page_enro_nomo1_list(self, form):
+        codes = [c for c, course in self.state.courses.items() if course[4] == "DEPT"]
+        return self._render("dept_list", rows=self._course_rows(codes, "v_tick"))
+
+    def page_enro_nomo2_check(self, form):
+        code = self.state.code_of(form["v_tick"][0])
+        return self._render(
+            "dept_check",
+            code=code,
+            name=self.state.courses[code][0],
+            secret=form["v_tick"][0],
+        )
+
+    def page_enro_nomo3_dml(self, form):
+        code = self.state.code_of(form["v_tick"][0])
+        return self._render(
+            "dept_final",
+            code=code,
+            name=self.state.courses[code][0],
+            teacher=self.state.courses[code][1],
+            message=self.state.enroll(code),
+        )
+
+    def page_enro_direct1_list(self, form):
+        return self._render("direct_list")
+
+    def page_enro_direct2_chk(self, form):
+        codes = [c for c in form.get("V_WANT", []) if c in self.state.courses]
+        return self._render("direct_check", rows=self._course_rows(codes, "v_tick"))
+
+    def page_enro_direct3_dml(self, form):
+        codes = [self.state.code_of(secret) for secret in form.get("v_tick", [])]
+        results = [(code, self.state.enroll(code)) for code in codes]
+        return self._render("direct_final", rows=self._result_rows(results))
+
+    def page_enro_del1_list(self, form):
+        codes = sorted(self.state.enrolled)
+        return self._render("delete_list", rows=self._course_rows(codes, "v_del"))
+
+    def page_enro_del2_check(self, form):
+        code = self.state.code_of(form["v_del"][0])
+        return self._render(
+            "delete_check",
+            code=code,
+            name=self.state.courses[code][0],
+            secret=form["v_del"][0],
+        )
+
+    def page_enro_del3_drop(self, form):
+        code = self.state.code_of(form["v_del"][0])
+        return self._render(
+            "delete_final",
+            code=code,
+            name=self.state.courses[code][0],
+            teacher=self.state.courses[code][1],
+            message=self.state.drop(code),
+        )
+
+
+class MockServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), courses=0, latency=0, etag=False):
+        super().__init__(address, Handler)
+        self.state = State(courses)
+        # Seconds every response is held back, like the real system under load
+        self.latency = latency
+        # Send ETags and answer If-None-Match with 304, unlike the real system
+        self.etag = etag
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def portal_url(self):
+        # Same server under another host name, so SSO and ACAD cookies are
+        # kept apart as on the real system
+        return f"http://localhost:{self.server_address[1]}"
+
+    def expire_sessions(self):
+        with self.state.lock:
+            self.state.sessions.clear()
+
+    def __enter__(self):
+        # Polled often, so shutting down takes milliseconds rather than 0.5s
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.01,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--courses", type=int, default=0, help="extra GE courses to list"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds to delay every response"
+    )
+    parser.add_argument(
+        "--etag", action="store_true", help="answer conditional requests with 304"
+    )
+    args = parser.parse_args()
+    server = MockServer((args.host, args.port), args.courses, args.latency, args.etag)
+    print(f"Serving mock ACAD on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
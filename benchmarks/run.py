@@ -0,0 +1,288 @@
+"""Benchmark nchu.Student against the local mock ACAD server
+
+Every scenario is timed over a number of iterations, then run again under
+tracemalloc to measure allocations. The mock server runs in a child process,
+so neither its CPU time nor its allocations are counted.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import tracemalloc
+from pathlib import Path
+from statistics import mean
+from time import perf_counter
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from mock_server import PASSWORD, USERNAME, MockServer  # noqa: E402
+
+import nchu  # noqa: E402
+from nchu.page import set_backend  # noqa: E402
+
+# Codes tried by add_course_with_codes, mixing success, full and conflict
+ADD_CODES = ["0349", "0412", "0501", "1161"]
+# Codes polled by one monitoring cycle
+WATCH_CODES = ["0348", "0412", "0433", "0502", "1159", "1160"]
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class Context:
+    def __init__(self, url, portal_url):
+        self.url = url
+        self.portal_url = portal_url
+        self._student = None
+
+    @property
+    def student(self):
+        if self._student is None:
+            self._student = nchu.Student(USERNAME, PASSWORD)
+            self._student.login_acad()
+        return self._student
+
+    def requests_served(self):
+        return int(requests.get(f"{self.url}/_requests").text)
+
+
+#
+# Scenarios, each returns the operation to measure
+#
+
+
+@scenario
+def login_sso(ctx):
+    return lambda: nchu.Student(USERNAME, PASSWORD)
+
+
+@scenario
+def ge_get_df(ctx):
+    html = ctx.student.ge_get_list()
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        return None
+    return lambda: nchu.Student.ge_get_df(html)
+
+
+@scenario
+def add_course_with_codes(ctx):
+    student = ctx.student
+    return lambda: student.add_course_with_codes(ADD_CODES)
+
+
+@scenario
+def get_questionnaire(ctx):
+    return ctx.student.get_questionnaire
+
+
+@scenario
+def monitor_cycle(ctx):
+    student = ctx.student
+
+    def cycle():
+        status = student.get_seat_status(WATCH_CODES)
+        vacant = [code for code, seats in status.items() if seats.vacant]
+        if vacant:
+            student.add_course_with_codes(vacant)
+
+    return cycle
+
+
+#
+# Measurement
+#
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def measure(ctx, op, iterations, warmup, alloc_iterations):
+    for _ in range(warmup):
+        op()
+
+    served = ctx.requests_served()
+    latencies = []
+    start = perf_counter()
+    for _ in range(iterations):
+        begin = perf_counter()
+        op()
+        latencies.append(perf_counter() - begin)
+    total = perf_counter() - start
+    served = ctx.requests_served() - served
+
+    peaks, retained = [], []
+    for _ in range(alloc_iterations):
+        tracemalloc.start()
+        op()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / total,
+        "requests_per_op": served / iterations,
+        "mean_ms": mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "peak_kib": mean(peaks) / 1024 if peaks else None,
+        "retained_kib": mean(retained) / 1024 if retained else None,
+    }
+
+
+#
+# Reporting
+#
+
+COLUMNS = (
+    ("ops_per_sec", "ops/s", "{:.1f}"),
+    ("requests_per_op", "req/op", "{:.1f}"),
+    ("p50_ms", "p50 ms", "{:.2f}"),
+    ("p90_ms", "p90 ms", "{:.2f}"),
+    ("p99_ms", "p99 ms", "{:.2f}"),
+    ("max_ms", "max ms", "{:.2f}"),
+    ("peak_kib", "peak KiB", "{:.1f}"),
+    ("retained_kib", "kept KiB", "{:.1f}"),
+)
+# Metrics where higher is better, every other one is lower-is-better
+HIGHER_IS_BETTER = {"ops_per_sec"}
+COMPARED = ("ops_per_sec", "p50_ms", "p99_ms", "peak_kib")
+
+
+def report(results):
+    width = max(map(len, results))
+    print(
+        "scenario".ljust(width),
+        *(title.rjust(10) for _, title, _ in COLUMNS),
+    )
+    for name, result in results.items():
+        if result is None:
+            print(name.ljust(width), "skipped".rjust(10))
+            continue
+        cells = [
+            "-" if result[key] is None else fmt.format(result[key])
+            for key, _, fmt in COLUMNS
+        ]
+        print(name.ljust(width), *(cell.rjust(10) for cell in cells))
+
+
+def compare(results, baseline, threshold):
+    """Print changes against a baseline, return names of regressed scenarios"""
+    regressed = []
+    print(f"\nAgainst baseline ({baseline['python']}, {baseline['backend']}):")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if result is None or before is None:
+            continue
+        changes = []
+        for key in COMPARED:
+            if result[key] is None or not before.get(key):
+                continue
+            change = result[key] / before[key] - 1
+            worse = -change if key in HIGHER_IS_BETTER else change
+            flag = " !" if worse > threshold else ""
+            if worse > threshold and name not in regressed:
+                regressed.append(name)
+            changes.append(f"{key} {change:+.1%}{flag}")
+        print(f"  {name}: {', '.join(changes)}")
+    return regressed
+
+
+def _serve(conn, courses):
+    server = MockServer(courses=courses)
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)}, default all"
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+        "--alloc-iterations",
+        type=int,
+        default=5,
+        help="iterations measured under tracemalloc",
+    )
+    parser.add_argument(
+        "--courses",
+        type=int,
+        default=300,
+        help="extra GE courses listed by the mock server",
+    )
+    parser.add_argument("--backend", choices=["lxml", "bs4"], default="lxml")
+    parser.add_argument("--save", metavar="PATH", help="store results as baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change reported as a regression",
+    )
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    set_backend(args.backend)
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=_serve, args=(child, args.courses), daemon=True
+    )
+    server.start()
+    port = parent.recv()
+    ctx = Context(f"http://127.0.0.1:{port}", f"http://localhost:{port}")
+    # Portal and ACAD under different host names keep their cookies apart
+    nchu.PORTAL_BASE = ctx.portal_url
+    nchu.ACAD_BASE = ctx.url
+
+    results = {}
+    try:
+        for name in args.scenarios or SCENARIOS:
+            op = SCENARIOS[name](ctx)
+            results[name] = op and measure(
+                ctx, op, args.iterations, args.warmup, args.alloc_iterations
+            )
+    finally:
+        server.terminate()
+
+    report(results)
+    if args.save:
+        record = {
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "nchu": nchu.__version__,
+            "results": results,
+        }
+        Path(args.save).write_text(json.dumps(record, indent=2))
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
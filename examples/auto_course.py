@@ -5,7 +5,8 @@ import time
 from pushover_complete import PushoverAPI
 from tqdm.auto import tqdm
 
-from nchu import Student
+from nchu import Outcome, Student
+from nchu.session import SessionStore
 
 # Fill in your credentials
 USERNAME = ""
@@ -30,16 +31,14 @@ def notify(message):
     p.send_message(PUSHOVER_USER_KEY, message, priority=2, expire=3600, retry=30)
 
 
-def handle_0349_conflict(Tomy, table):
-    available_seat = int(table.find_all("td")[8].string)
-    selected_seat = int(table.find_all("td")[9].string)
+def handle_0349_conflict(Tomy, index):
     message = ""
-    if available_seat > selected_seat:
+    if index["0349"].vacant:
         notify("OP-GDYY Triggered")
         try:
-            Tomy.remove_course("0348")
-            table, messages = Tomy.add_course_with_codes(["0349"])
-            message = messages[0]
+            result = Tomy.swap_course("0348", "0349")
+            logging.info(f"OP-GDYY window: {result.window * 1000:.0f}ms")
+            message = result.added
         except Exception:
             logging.exception("Error")
             message = "Error"
@@ -49,20 +48,7 @@ def handle_0349_conflict(Tomy, table):
 
 
 def check_python(Tomy):
-    url_list = "https://onepiece2-sso.nchu.edu.tw/cofsys/plsql/enro_direct1_list"
-    url_check = "https://onepiece2-sso.nchu.edu.tw/cofsys/plsql/enro_direct2_chk"
-
-    r1 = Tomy.session.get(url_list)
-    assert r1.status_code == 200
-    assert "選課號碼加選" in r1.text
-
-    resp_check = Tomy.session.post(url_check, data="V_WANT=1159")
-    assert resp_check.status_code == 200
-    assert "1159" in resp_check.text
-    course_table = Tomy._get_add_course_form_table(resp_check.text, "CODE")
-    available_seat = int(course_table.find_all("td")[8].string)
-    selected_seat = int(course_table.find_all("td")[9].string)
-    if available_seat > selected_seat:
+    if Tomy.get_seat_status(["1159"])["1159"].vacant:
         notify("OP-Python now Available")
     else:
         logging.info("OP-Python checked without select")
@@ -78,8 +64,7 @@ if __name__ == "__main__":
             logging.info("-----Start Session-----")
             # Start new Session
             monitoring = load_monitoring_courses()
-            Tomy = Student(USERNAME, PASSWORD)
-            Tomy.login_acad()
+            Tomy = Student(USERNAME, PASSWORD, session_store=SessionStore())
             logging.info("Login Success")
 
             # Loop for monitoring
@@ -92,20 +77,21 @@ if __name__ == "__main__":
                 success = False
                 for i in range(try_count):
                     try:
-                        table, messages = Tomy.add_course_with_codes(course_codes)
-                        logging.info(messages)
+                        index, results = Tomy.add_courses(course_codes)
+                        logging.info([result.message for result in results])
 
                         # Special handle for 0349 GuDianYinYueShangXi
                         if "0349" in course_codes:
-                            message = handle_0349_conflict(Tomy, table)
-                            if "加選成功" in message:
+                            message = handle_0349_conflict(Tomy, index)
+                            if Outcome.of(message) is Outcome.ADDED:
                                 notify(f"Selected: 0349 ({message})")
                                 selected.append("0349")
 
-                        # for idx, msg in enumerate(messages):
-                        #     if "加選成功" in msg:
-                        #         notify(f"Selected: {course_codes[idx]} ({msg})")
-                        #         selected.append(course_codes[idx])
+                        for result in results:
+                            code = result.code
+                            if result.outcome is Outcome.ADDED and code not in selected:
+                                notify(f"Selected: {code} ({result.message})")
+                                selected.append(code)
                         logging.info("Attempt failed with no error")
                         break
                     except Exception:
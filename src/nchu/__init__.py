@@ -1,25 +1,39 @@
 """SDK for accessing NCHU Portal System"""
 import logging
+import os
+import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from functools import wraps
 from getpass import getpass
-from time import time
+from random import random
+from time import perf_counter, sleep, time
+from typing import Any, NamedTuple, Optional
 from urllib import parse
 
-import bs4
-import pandas as pd
 import requests
+from urllib3.exceptions import NewConnectionError
+
+from . import ratelimit
+from .cache import ResponseCache
+from .course import CourseCatalog, CourseIndex, _courses, to_dataframe
+from .metrics import MetricsCollector, RequestEvent  # noqa: F401
+from .page import Page
+from .transport import Transport
 
 __version__ = "0.2.0"
 
 logger = logging.getLogger(__name__)
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler = logging.FileHandler(f"log_{int(time())}.log")
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(file_handler)
+logger.addHandler(logging.NullHandler())
+# One DEBUG record per request, with the fields of metrics.RequestEvent as
+# attributes of the record
+request_logger = logging.getLogger(f"{__name__}.request")
+
+# Directory to write a traceback file into whenever catch_error catches one,
+# set by log_to_file
+traceback_dir = None
 
 UA = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 11_1_0) "
@@ -54,6 +68,32 @@ ACAD_MAP = {
     "ques_ta_send": "cofsys/plsql/ta_ques_stu_des_udt",
 }
 
+# Endpoints changing enrollment or answers, never sent twice on an ambiguous
+# failure (timeouts, dropped connections, server errors)
+FINAL_ENDPOINTS = {
+    "ge_final",
+    "dept_final",
+    "direct_final",
+    "delete_final",
+    "ques_final",
+    "ques_ta_send",
+}
+
+# Pages ACAD serves in place of the requested one
+EXPIRED_MARKERS = ("請重新登入", "連線逾時", "閒置過久")
+CLOSED_MARKER = "本時段不開放此功能"
+
+# Tables of the GE list page holding courses, one per category
+GE_TABLES = (6, 8, 10)
+# Questionnaires filled at once by fill_all_questionnaires
+QUESTIONNAIRE_WORKERS = 4
+
+# Number of V_WANT fields offered by the direct add form, codes beyond it are
+# sent in further requests
+DIRECT_BATCH_SIZE = 10
+# Seconds a fetched GE or dept course list is reused by Student.catalog
+CATALOG_TTL = 60
+
 ERROR_MSG = """
 Oops, error <{error}> raised when running <{func_name}>!
 details: {error_msg}
@@ -75,10 +115,212 @@ class FillingPolicy(Enum):
     GREAT = 5
 
 
+class FillResult(NamedTuple):
+    questionnaire: Any
+    filled: bool
+    error: Optional[BaseException]
+
+
+class SessionExpiredError(RuntimeError):
+    pass
+
+
+class FunctionClosedError(RuntimeError):
+    pass
+
+
+class OutcomeUnknownError(RuntimeError):
+    """A final request may have been carried out, but no answer came back"""
+
+
+class SwapResult(NamedTuple):
+    swapped: bool
+    dropped: str
+    added: str
+    # Message of re-adding the dropped course, None if not needed
+    rollback: Optional[str]
+    # Seconds from sending the drop until either course is held again
+    window: float
+
+
+class SwapError(RuntimeError):
+    """The add of a swap and the rollback of its drop both failed"""
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
+class Outcome(Enum):
+    """What adding or dropping one course came to, read from its message"""
+
+    ADDED = "added"
+    DROPPED = "dropped"
+    FULL = "full"
+    CONFLICT = "conflict"
+    DUPLICATE = "duplicate"
+    NOT_FOUND = "not_found"
+    NOT_ENROLLED = "not_enrolled"
+    CREDIT_LIMIT = "credit_limit"
+    CLOSED = "closed"
+    EXPIRED = "expired"
+    UNKNOWN = "unknown"
+
+    @classmethod
+    def of(cls, message):
+        for marker, outcome in OUTCOME_MARKERS:
+            if marker in message:
+                return outcome
+        return cls.UNKNOWN
+
+    @property
+    def ok(self):
+        return self in (Outcome.ADDED, Outcome.DROPPED)
+
+    @property
+    def hopeless(self):
+        """Trying the same code again cannot succeed, unlike when it is full"""
+        return self in HOPELESS_OUTCOMES
+
+
+# Substrings of result messages and what they mean, first match wins
+OUTCOME_MARKERS = (
+    ("加選成功", Outcome.ADDED),
+    ("退選成功", Outcome.DROPPED),
+    ("額滿", Outcome.FULL),
+    ("衝堂", Outcome.CONFLICT),
+    ("已選過", Outcome.DUPLICATE),
+    ("查無", Outcome.NOT_FOUND),
+    ("未選此課程", Outcome.NOT_ENROLLED),
+    ("學分", Outcome.CREDIT_LIMIT),
+    (CLOSED_MARKER, Outcome.CLOSED),
+    *((marker, Outcome.EXPIRED) for marker in EXPIRED_MARKERS),
+)
+HOPELESS_OUTCOMES = {
+    Outcome.CONFLICT,
+    Outcome.DUPLICATE,
+    Outcome.NOT_FOUND,
+    Outcome.NOT_ENROLLED,
+    Outcome.CREDIT_LIMIT,
+}
+
+
+class CourseResult(NamedTuple):
+    code: str
+    outcome: Outcome
+    message: str
+
+
+class EnrollmentError(RuntimeError):
+    """Adding or dropping a course failed, see ``result.outcome`` for why"""
+
+    def __init__(self, result):
+        super().__init__(result.message or f"<{result.code}> {result.outcome.value}")
+        self.result = result
+
+    @property
+    def outcome(self):
+        return self.result.outcome
+
+
+class RetryPolicy(NamedTuple):
+    """Exponential backoff with jitter for closed functions and network errors
+
+    Attempt n waits min(max_backoff, backoff * 2 ** n), of which up to a
+    jitter fraction is randomly taken off.
+    """
+
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: float = 0.5
+
+    def delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay * (1 - self.jitter * random())
+
+
 def _acad_url(path: str):
     return parse.urljoin(ACAD_BASE, ACAD_MAP[path])
 
 
+def _is_expired(response):
+    # Either bounced back to the SSO login, or told to login again
+    if parse.urlparse(response.url).hostname != parse.urlparse(ACAD_BASE).hostname:
+        return True
+    return any(marker in response.text for marker in EXPIRED_MARKERS)
+
+
+def _outcome(response):
+    if _is_expired(response):
+        return "expired"
+    if CLOSED_MARKER in response.text:
+        return "closed"
+    if response.status_code >= 500:
+        return "server_error"
+    return "ok"
+
+
+def _results(page, course_codes):
+    """Result of every code from a final page, missing ones are UNKNOWN
+
+    Result rows start with the course code and end with the message,
+    wherever their table is placed on the page.
+    """
+    messages = {}
+    for row in page.find_all(page.root, "tr"):
+        cells = page.find_all(row, "td")
+        if len(cells) > 1:
+            messages.setdefault(page.text(cells[0]), page.text(cells[-1]))
+    return [
+        CourseResult(code, Outcome.of(messages.get(code, "")), messages.get(code, ""))
+        for code in course_codes
+    ]
+
+
+def _with_not_found(course_codes, results):
+    """Results in the order of course_codes, NOT_FOUND for codes without one"""
+    results = {result.code: result for result in results}
+    return [
+        results.get(
+            code, CourseResult(code, Outcome.NOT_FOUND, f"<{code}> cannot be found")
+        )
+        for code in course_codes
+    ]
+
+
+def _unsent(error):
+    """Whether a request failed before reaching the server at all"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _chunks(items, size):
+    items = list(items)
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
+
+
+def log_to_file(directory=".", level=logging.DEBUG):
+    """Write logs, and a traceback file per caught error, into directory
+
+    Nothing is written anywhere unless this is called (or handlers are added
+    to the ``nchu`` logger some other way).
+    """
+    global traceback_dir
+    handler = logging.FileHandler(os.path.join(directory, f"log_{int(time())}.log"))
+    handler.setLevel(level)
+    handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    traceback_dir = directory
+    return handler
+
+
 def catch_error(func):
     @wraps(func)
     def decorated_function(*args, **kwargs):
@@ -92,12 +334,17 @@ def catch_error(func):
                     error=error.__class__.__name__,
                     error_msg=str(error),
                     func_name=func.__name__,
-                )
+                ),
+                file=sys.stderr,
             )
-            traceback_file = f"traceback_{int(time())}.txt"
-            with open(traceback_file, "w") as f:
-                f.write(traceback.format_exc())
-            logger.info(f"Write traceback to {traceback_file}")
+            logger.debug("%s failed", func.__name__, exc_info=True)
+            if traceback_dir is not None:
+                traceback_file = os.path.join(
+                    traceback_dir, f"traceback_{int(time())}.txt"
+                )
+                with open(traceback_file, "w") as f:
+                    f.write(traceback.format_exc())
+                logger.info("Write traceback to %s", traceback_file)
 
     return decorated_function
 
@@ -105,59 +352,113 @@ def catch_error(func):
 def acad_required(func):
     @wraps(func)
     def decorated_function(self, *args, **kwargs):
-        if not any(
-            [parse.urlparse(ACAD_BASE).netloc in c.domain for c in self.session.cookies]
-        ):
-            self.login_acad()
+        if not self._acad_cookies():
+            with self._login_lock:
+                # Another thread may have logged in while this one waited
+                if not self._acad_cookies():
+                    self.login_acad()
         return func(self, *args, **kwargs)
 
     return decorated_function
 
 
 class Student:
-    def __init__(self, username=None, password=None):
+    def __init__(
+        self,
+        username=None,
+        password=None,
+        adapter=None,
+        session_store=None,
+        retry=RetryPolicy(),
+        rate_limiter=None,
+        hooks=None,
+        transport=None,
+    ):
         if not username:
             username = input("Username: ")
         if not password:
             password = getpass("Password: ")
         self.username = username
         self.__password = password
-        logger.info(f"User <{self.username}> created")
+        logger.info("User <%s> created", self.username)
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": UA})
+        # Timeouts, pooling and compression, see nchu.transport.Transport. A
+        # given adapter shares its connection pool (e.g. with nchu.aio.Pool)
+        self.transport = transport or Transport()
+        self.transport.mount(self.session, adapter)
+        self.session_store = session_store
+        self.retry = retry
+        # Held while logging in to ACAD, so concurrent requests login only once
+        self._login_lock = threading.Lock()
+        self._acad_logins = 0
+        self.rate_limiter = rate_limiter or ratelimit.shared
+        # Callables given a metrics.RequestEvent after every request
+        self.hooks = list(hooks or [])
+        # Parsed results of polled pages, reused while they come back unchanged
+        self.responses = ResponseCache()
+        self.catalog = CourseCatalog(
+            {"GE": self.ge_get_list, "ACAD": self.acad_get_list}, ttl=CATALOG_TTL
+        )
+        if self.restore_session():
+            logger.info("User <%s> restored saved session", self.username)
+            return
         self.login_sso()
-        logger.info(f"User <{self.username}> logined to SSO")
+        logger.info("User <%s> logined to SSO", self.username)
 
     #
     # Login Methods
     #
 
+    def restore_session(self):
+        """Load cookies from session_store, keep them only if still valid"""
+        if not self.session_store:
+            return False
+        cookies = self.session_store.load(self.username)
+        if not cookies:
+            return False
+        try:
+            for cookie in cookies:
+                self.session.cookies.set(**cookie)
+            # One cheap ACAD request tells whether the server still knows us
+            page_sidebar = self._send("GET", "sidebar")
+            if page_sidebar.status_code == 200 and self.username in page_sidebar.text:
+                return True
+        except (requests.RequestException, TypeError) as error:
+            # Fall back to a full login, which reports real network errors
+            logger.info("Cannot restore session of <%s>: %r", self.username, error)
+        self.session.cookies.clear()
+        self.session_store.delete(self.username)
+        return False
+
+    def save_session(self):
+        if self.session_store:
+            self.session_store.save(self.username, self.session.cookies)
+
     @catch_error
     def login_sso(self):
         # Hit Portal to get SSO login location
-        page_portal_entry = self.session.get(PORTAL_BASE)
-        soup_portal_entry = bs4.BeautifulSoup(page_portal_entry.text, features="lxml")
+        page_portal_entry = Page.from_response(self._send("GET", PORTAL_BASE))
         url_sso_entry = parse.urljoin(
-            page_portal_entry.url, soup_portal_entry.find("form").attrs["action"]
+            page_portal_entry.url,
+            page_portal_entry.attr(page_portal_entry.forms[0], "action"),
         )
-        logger.debug(f"SSO Entry URL: {url_sso_entry}")
+        logger.debug("SSO Entry URL: %s", url_sso_entry)
 
         # Get SSO login page
-        page_sso_entry = self.session.post(url_sso_entry)
+        page_sso_entry = self._send("POST", url_sso_entry)
         assert page_sso_entry.status_code == 200
-        form_sso = bs4.BeautifulSoup(page_sso_entry.text, features="lxml").find("form")
-        url_sso_login = form_sso.attrs["action"]
-        form_login_data = {
-            field["name"]: field["value"]
-            for field in form_sso.select("input[type=hidden]")
-        }
-        logger.debug(f"SSO login URL: {url_sso_login}")
-        logger.debug(f"SSO login data (redacted): {form_login_data}")
+        page_sso = Page.from_response(page_sso_entry)
+        url_sso_login = page_sso.attr(page_sso.forms[0], "action")
+        form_login_data = dict(page_sso.hidden_inputs())
+        logger.debug("SSO login URL: %s", url_sso_login)
+        logger.debug("SSO login data (redacted): %s", form_login_data)
         form_login_data["Ecom_User_ID"] = self.username
         form_login_data["Ecom_Password"] = self.__password
 
         # Login with URL given in entry page
-        page_sso_login = self.session.post(
+        page_sso_login = self._send(
+            "POST",
             url_sso_login,
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             data=form_login_data,
@@ -165,12 +466,14 @@ class Student:
         assert page_sso_login.status_code == 200
         if "Login failed" in page_sso_login.text or "登入失敗" in page_sso_login.text:
             raise ValueError("Incorrect password")
+        self.save_session()
 
     @catch_error
     def login_acad(self):
         # Redirect Authentication to ACAD System and acquire frameset
-        page_login = self.session.post(
-            _acad_url("login"),
+        page_login = self._send(
+            "POST",
+            "login",
             headers={
                 "Content-Type": "application/x-www-form-urlencoded",
             },
@@ -185,51 +488,184 @@ class Student:
         logger.debug("ACAD Login request success")
 
         # Get ACAD Sidebar (for verification)
-        page_sidebar = self.session.get(_acad_url("sidebar"))
+        page_sidebar = self._send("GET", "sidebar")
         assert page_sidebar.status_code == 200
         assert self.username in page_sidebar.text
         logger.debug("ACAD Sidebar request success")
 
-        logger.info(f"User <{self.username}> logined to ACAD")
+        logger.info("User <%s> logined to ACAD", self.username)
+        self._acad_logins += 1
+        self.save_session()
+
+    def _acad_cookies(self):
+        hostname = parse.urlparse(ACAD_BASE).hostname
+        return any(hostname in cookie.domain for cookie in self.session.cookies)
+
+    #
+    # Request Methods
+    #
+
+    def _send(self, method, endpoint, attempt=0, **kwargs):
+        """One request to an ACAD_MAP endpoint (or a full URL), rate limited"""
+        url = _acad_url(endpoint) if endpoint in ACAD_MAP else endpoint
+        kwargs.setdefault("timeout", self.transport.timeout)
+        queued = start = perf_counter()
+        response = None
+        try:
+            with self.rate_limiter.limit(endpoint):
+                start = perf_counter()
+                response = self.session.request(method, url, **kwargs)
+            return response
+        finally:
+            if self.hooks or request_logger.isEnabledFor(logging.DEBUG):
+                elapsed = perf_counter() - start
+                if endpoint in ACAD_MAP:
+                    outcome = "error" if response is None else _outcome(response)
+                else:
+                    # SSO and Portal, tagged by host and path instead
+                    url = parse.urlsplit(url)
+                    endpoint = url.netloc + url.path
+                    outcome = "ok" if response is not None else "error"
+                self._emit(
+                    RequestEvent(
+                        username=self.username,
+                        endpoint=endpoint,
+                        method=method,
+                        status=None if response is None else response.status_code,
+                        bytes=0 if response is None else len(response.content),
+                        elapsed=elapsed,
+                        queued=start - queued,
+                        attempt=attempt,
+                        outcome=outcome,
+                    )
+                )
+
+    def _emit(self, event):
+        """Log a finished request and pass it to every hook"""
+        if request_logger.isEnabledFor(logging.DEBUG):
+            fields = event._asdict()
+            request_logger.debug(
+                "%(method)s %(endpoint)s %(status)s %(bytes)dB %(elapsed).3fs "
+                "(%(outcome)s, attempt %(attempt)d)",
+                fields,
+                extra=fields,
+            )
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logger.exception("Hook %r failed", hook)
+
+    def _request(self, method, endpoint, **kwargs):
+        """Request an ACAD_MAP endpoint (or a full URL)
+
+        An expired session is logged in again once and the request replayed,
+        by one thread at a time; the others replay on the new session.
+        Closed functions, connection errors and server errors are retried with
+        backoff according to self.retry. Final requests (FINAL_ENDPOINTS) are
+        only retried when the server surely did not act on them, otherwise
+        OutcomeUnknownError is raised.
+        """
+        relogined = False
+        attempt = 0
+        while True:
+            logins = self._acad_logins
+            try:
+                response = self._send(method, endpoint, attempt, **kwargs)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                response, error = None, exc
+
+            if response is not None and _is_expired(response):
+                if relogined:
+                    raise SessionExpiredError(f"Session expired on <{endpoint}>")
+                relogined = True
+                with self._login_lock:
+                    # Replay at once if another thread logged in meanwhile
+                    if self._acad_logins == logins:
+                        logger.info("Session expired on <%s>, login again", endpoint)
+                        self.login_acad()
+                continue
+
+            if response is not None and CLOSED_MARKER in response.text:
+                error = FunctionClosedError(f"<{endpoint}> {CLOSED_MARKER}")
+            elif response is not None and response.status_code >= 500:
+                error = requests.HTTPError(
+                    f"{response.status_code} on <{endpoint}>", response=response
+                )
+            if error is None:
+                return response
+
+            # A closed function or an unopened connection did nothing, anything
+            # else may have reached the server
+            final = endpoint in FINAL_ENDPOINTS
+            if final and not isinstance(error, FunctionClosedError):
+                if response is not None or not _unsent(error):
+                    raise OutcomeUnknownError(
+                        f"No answer to <{endpoint}>, it may have been carried out"
+                    ) from error
+            if attempt >= self.retry.retries:
+                raise error
+            delay = self.retry.delay(attempt)
+            logger.info("%s, retry in %.2fs", error, delay)
+            sleep(delay)
+            attempt += 1
+
+    def _get(self, endpoint, **kwargs):
+        return self._request("GET", endpoint, **kwargs)
+
+    def _post(self, endpoint, **kwargs):
+        return self._request("POST", endpoint, **kwargs)
+
+    def _parsed(self, method, endpoint, parse, data=None):
+        """parse(response) of a request, reused while the response is unchanged"""
+        key = ResponseCache.key(method, endpoint, data)
+        response = self._request(
+            method, endpoint, data=data, headers=self.responses.headers(key)
+        )
+        return self.responses.resolve(key, response, parse)
 
     #
     # Questionnaire methods
     #
 
-    @catch_error
     @acad_required
-    def get_questionnaire(self):
-        logger.info("BEGIN: get_questionnaire")
-        url_list = _acad_url("ques_list")
-        page = self.session.get(url_list)
+    def iter_questionnaires(self):
+        """Yield every questionnaire of the list page as soon as it is parsed"""
+        yield from self._questionnaires(self._get("ques_list"))
+
+    @staticmethod
+    def _questionnaires(page):
         page.raise_for_status()
         assert "期末教學意見調查" in page.text
         logger.debug("List page request success")
 
-        table = bs4.BeautifulSoup(page.text, features="lxml").find_all("table")[2]
-        header = ["".join(tag.strings) for tag in table.select("th")]
-        print(table.find_all("tr"))
-        links = []
-        complete = []
-        for row in table.find_all("tr"):
-            if not row.select_one("td:nth-of-type(10) a"):
+        page = Page.from_response(page)
+        header = None
+        for table, row in page.iter_rows(tables=[2]):
+            if header is None:
+                header = [
+                    "".join(page.strings(th)) for th in page.find_all(table, "th")
+                ]
+            cells = page.find_all(row, "td")
+            link = page.find(cells[9], "a") if len(cells) > 10 else None
+            if link is None:
                 continue
-        links = [
-            parse.urljoin(url_list, row.select_one("td:nth-of-type(10) a")["href"])
-            for row in table.find_all("tr")
-        ]
-        complete = [
-            bool(row.select_one("td:nth-of-type(11) img"))
-            for row in table.find_all("tr")
-        ]
-        logger.debug(f"Parsed links: {links}")
-        logger.debug(f"Parsed complete: {complete}")
-        converters = {i: lambda x: str(x) for i in range(11)}
-        df = pd.read_html(str(table), converters=converters)[0]
-        df.columns = header
-        df["填答評量"] = links
-        df["完成填答"] = complete
-        results = [val for key, val in df.T.to_dict().items()]
+            questionnaire = dict(zip(header, map(page.text, cells)))
+            questionnaire["填答評量"] = parse.urljoin(page.url, page.attr(link, "href"))
+            questionnaire["完成填答"] = bool(page.find_all(cells[10], "img"))
+            yield questionnaire
+
+    @catch_error
+    @acad_required
+    def get_questionnaire(self):
+        logger.info("BEGIN: get_questionnaire")
+        parsed = self._parsed(
+            "GET", "ques_list", lambda page: list(self._questionnaires(page))
+        )
+        # Copies, the parsed ones are kept for the next unchanged list page
+        results = [dict(questionnaire) for questionnaire in parsed]
+        logger.debug("Parsed questionnaires: %s", results)
         logger.info("END: get_questionnaire")
 
         return results
@@ -239,60 +675,51 @@ class Student:
     def fill_questionnaire(self, questionnaire, policy=FillingPolicy.GREAT):
         logger.info("BEGIN: fill_questionnaire")
         policy = FillingPolicy(policy)
-        logger.debug(f"policy: {policy}")
-        page_fill = self.session.get(questionnaire["填答評量"])
+        logger.debug("policy: %s", policy)
+        page_fill = self._get(questionnaire["填答評量"])
         assert page_fill.status_code == 200
         assert questionnaire["課程名稱"] in page_fill.text
         logger.debug("Fill page request success")
 
         # Prepare form data
-        form_fill_data = {}
-        form_fill = bs4.BeautifulSoup(page_fill.text, features="lxml").find("form")
+        form_fill = Page.from_response(page_fill)
 
         # Collect hidden field
-        hiddens = form_fill.select("input[type=hidden]")
-        for field in hiddens:
-            form_fill_data[field["name"]] = field["value"]
-        logger.debug(f"hiddens: {hiddens}")
+        hiddens = form_fill.hidden_inputs()
+        form_fill_data = dict(hiddens)
+        logger.debug("hiddens: %s", hiddens)
 
         # Fill radios
-        radios = {field["name"]: "" for field in form_fill.select("input[type=radio]")}
+        radios = form_fill.input_names("radio")
         for field in radios:
             form_fill_data[field] = policy.value
-        logger.debug(f"hiddens: {hiddens}")
+        logger.debug("radios: %s", radios)
 
         # Outliners
         if "v_A1" in form_fill_data:
             form_fill_data["v_A1"] = 1
-            logger.debug(f"v_A1 fixed: {form_fill_data['v_A1']}")
+            logger.debug("v_A1 fixed: %s", form_fill_data["v_A1"])
         if "v_B10" in form_fill_data:
             form_fill_data["v_B10"] = 3 - (policy.value - 3)
-            logger.debug(f"v_B10 fixed: {form_fill_data['v_B10']}")
+            logger.debug("v_B10 fixed: %s", form_fill_data["v_B10"])
 
         # Fill texts
-        texts = {field["name"]: "" for field in form_fill.select("input[type=text]")}
+        texts = form_fill.input_names("text")
         for field in texts:
             form_fill_data[field] = ""
-        logger.debug(f"texts: {texts}")
+        logger.debug("texts: %s", texts)
 
-        logger.debug(f"form_fill_data: {form_fill_data}")
-        url_confirm = _acad_url("ques_confirm")
-        page_confirm = self.session.post(url_confirm, data=form_fill_data)
+        logger.debug("form_fill_data: %s", form_fill_data)
+        page_confirm = self._post("ques_confirm", data=form_fill_data)
         assert page_confirm.status_code == 200
         assert questionnaire["課程名稱"] in page_confirm.text
         logger.debug("Confirm page request success")
 
         # Recollect data from confirm form
-        form_confirm_data = {}
-        form_confirm = bs4.BeautifulSoup(page_confirm.text, features="lxml").find(
-            "form"
-        )
-        for field in form_confirm.select("input[type=hidden]"):
-            form_confirm_data[field["name"]] = field["value"]
+        form_confirm_data = Page.from_response(page_confirm).hidden_inputs()
 
-        logger.debug(f"form_confirm_data: {form_confirm_data}")
-        url_final = _acad_url("ques_final")
-        page_final = self.session.post(url_final, data=form_confirm_data)
+        logger.debug("form_confirm_data: %s", form_confirm_data)
+        page_final = self._post("ques_final", data=form_confirm_data)
         assert page_final.status_code == 200
         assert "儲存完成" in page_final.text
         logger.debug("Final page request success")
@@ -304,35 +731,33 @@ class Student:
     @acad_required
     def get_ta_questionnaire(self):
         logger.info("BEGIN: get_ta_questionnaire")
-        url_list = _acad_url("ques_ta_list")
-        page = self.session.get(url_list)
+        page = self._get("ques_ta_list")
         assert page.status_code == 200
         assert "學生TA服務意見調查" in page.text
         logger.debug("List page request success")
 
-        table = bs4.BeautifulSoup(page.text, features="lxml").find_all("table")[2]
-        header = ["".join(tag.strings) for tag in table.select("th")]
+        page = Page.from_response(page)
+        header = page.header(table=2)
 
         # Parse Results
         results = []
-        for course in table.find_all("tr"):
+        for course in page.rows(table=2):
             questionnaire = {}
-            for index, (key, content) in enumerate(zip(header, course.find_all("td"))):
+            cells = page.find_all(course, "td")
+            for index, (key, content) in enumerate(zip(header, cells)):
                 if index == 7:
-                    questionnaire[key] = []
+                    # Also under a fixed key, like the link of a questionnaire
+                    questionnaire[key] = questionnaire["填答評量"] = []
                     questionnaire["完成填答"] = []
-                    for form in content.find_all("form"):
-                        questionnaire[key].append(
-                            {
-                                field["name"]: field["value"]
-                                for field in form.select("input[type=hidden]")
-                            }
-                        )
+                    for form in page.find_all(content, "form"):
+                        questionnaire[key].append(page.hidden_inputs(form))
                         questionnaire["完成填答"].append(
-                            bool("已填寫" in "".join(form.strings))
+                            bool("已填寫" in "".join(page.strings(form)))
                         )
                 else:
-                    questionnaire[key] = "".join(content.strings).replace("\n", "")
+                    questionnaire[key] = "".join(page.strings(content)).replace(
+                        "\n", ""
+                    )
             results.append(questionnaire)
 
         logger.info("END: get_ta_questionnaire")
@@ -343,34 +768,32 @@ class Student:
     def fill_ta_questionnaire(self, ta_questionnaire, policy=FillingPolicy.GREAT):
         logger.info("BEGIN: fill_ta_questionnaire")
         policy = FillingPolicy(policy)
-        logger.debug(f"policy: {policy}")
-        page_fill = self.session.post(_acad_url("ques_ta_fill"), data=ta_questionnaire)
+        logger.debug("policy: %s", policy)
+        page_fill = self._post("ques_ta_fill", data=ta_questionnaire)
         assert page_fill.status_code == 200
         assert ta_questionnaire["v_ta"] in page_fill.text
         logger.debug("Fill page request success")
 
         # Prepare form data
-        form_fill_data = {}
-        form_fill = bs4.BeautifulSoup(page_fill.text, features="lxml").find("form")
+        form_fill = Page.from_response(page_fill)
 
         # Collect hidden field
-        hiddens = form_fill.select("input[type=hidden]")
-        for field in hiddens:
-            form_fill_data[field["name"]] = field["value"]
-        logger.debug(f"hiddens: {hiddens}")
+        hiddens = form_fill.hidden_inputs()
+        form_fill_data = dict(hiddens)
+        logger.debug("hiddens: %s", hiddens)
 
         # Fill radios
-        radios = {field["name"]: "" for field in form_fill.select("input[type=radio]")}
+        radios = form_fill.input_names("radio")
         for field in radios:
             form_fill_data[field] = policy.value
-        logger.debug(f"hiddens: {hiddens}")
+        logger.debug("radios: %s", radios)
 
         # Fill texts
-        form_fill_data[form_fill.find("textarea")["name"]] = ""
+        textarea = form_fill.find(form_fill.forms[0], "textarea")
+        form_fill_data[form_fill.attr(textarea, "name")] = ""
 
-        logger.debug(f"form_fill_data: {form_fill_data}")
-        url_send = _acad_url("ques_ta_send")
-        page_send = self.session.post(url_send, data=form_fill_data)
+        logger.debug("form_fill_data: %s", form_fill_data)
+        page_send = self._post("ques_ta_send", data=form_fill_data)
         assert page_send.status_code == 200
         assert f"{ta_questionnaire['v_ta']}&nbsp;&nbsp;已填寫" in page_send.text
         logger.debug("Confirm page request success")
@@ -378,86 +801,129 @@ class Student:
         logger.info("END: fill_ta_questionnaire")
         return True
 
+    def _fill_all(self, fill, pending, policy, max_workers):
+        max_workers = max(1, min(max_workers, QUESTIONNAIRE_WORKERS))
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [
+                (questionnaire, executor.submit(fill, self, questionnaire, policy))
+                for questionnaire in pending
+            ]
+        report = []
+        for questionnaire, future in futures:
+            try:
+                report.append(FillResult(questionnaire, bool(future.result()), None))
+            except Exception as error:
+                report.append(FillResult(questionnaire, False, error))
+        return report
+
+    @acad_required
+    def fill_all_questionnaires(
+        self, policy=FillingPolicy.GREAT, max_workers=QUESTIONNAIRE_WORKERS
+    ):
+        """Fill every pending questionnaire concurrently, return a FillResult each
+
+        At most QUESTIONNAIRE_WORKERS are in flight, whatever max_workers says.
+        A failure to fetch the list is raised, not reported as nothing pending.
+        """
+        # Bypass catch_error, so failures are raised or end up in the report
+        questionnaires = Student.get_questionnaire.__wrapped__(self)
+        pending = [q for q in questionnaires if not q["完成填答"]]
+        fill = Student.fill_questionnaire.__wrapped__
+        return self._fill_all(fill, pending, policy, max_workers)
+
+    @acad_required
+    def fill_all_ta_questionnaires(
+        self, policy=FillingPolicy.GREAT, max_workers=QUESTIONNAIRE_WORKERS
+    ):
+        pending = [
+            ta_questionnaire
+            for course in Student.get_ta_questionnaire.__wrapped__(self)
+            for ta_questionnaire, done in zip(course["填答評量"], course["完成填答"])
+            if not done
+        ]
+        fill = Student.fill_ta_questionnaire.__wrapped__
+        return self._fill_all(fill, pending, policy, max_workers)
+
     #
     # Add/Drop Course Methods
     #
 
-    @staticmethod
-    def _get_add_course_form_table(raw_html, method):
-        INDEX = {
-            "GE": 1,
-            "ACAD": 1,
-            "CODE": 0,
-            "DROP": 0,
+    @acad_required
+    def get_course_index(self, method):
+        """Fetch the GE, ACAD or DROP list page and index its courses"""
+        fetch = {
+            "GE": self.ge_get_list,
+            "ACAD": self.acad_get_list,
+            "DROP": self.delete_get_list,
         }
-        soup = bs4.BeautifulSoup(raw_html, "lxml")
-        course_table = soup.find_all("form")[INDEX[method]]
-        return course_table
-
-    @staticmethod
-    def _course_code_to_secret(course_table, course_code):
-        for tag in course_table.find_all("tr"):
-            if tag.find_all("td")[1].string == course_code:
-                return tag.find("input").attrs["value"]
-        return None
+        if method not in fetch:
+            raise ValueError(f"Cannot list courses of method <{method}>")
+        return CourseIndex.from_page(fetch[method](), method)
 
+    @acad_required
     def ge_get_list(self):
-        r6 = self.session.get(_acad_url("ge_entry"))
+        r6 = self._get("ge_entry")
         assert r6.status_code == 200
         assert "選課狀態" in r6.text
 
-        r7 = self.session.get(_acad_url("ge_select"))
+        r7 = self._get("ge_select")
         assert r7.status_code == 200
         assert "本時段不開放此功能" not in r7.text
 
-        r8 = self.session.post(_acad_url("ge_list"))
+        r8 = self._post("ge_list")
         assert r8.status_code == 200
         assert "本時段不開放此功能" not in r8.text
         assert "通識課程一覽表" in r8.text
 
         return r8.text
 
+    @staticmethod
+    def ge_get_rows(raw_html):
+        """Cell texts of every row in the GE course tables"""
+        page = Page.of(raw_html)
+        return [
+            tuple(page.text(cell) for cell in page.find_all(row, "td"))
+            for _, row in page.iter_rows(tables=GE_TABLES)
+        ]
+
+    def iter_ge_courses(self, raw_html=None):
+        """Yield every GE course as soon as its row is parsed
+
+        Stop iterating once the course needed is found, the rest of the page
+        is then never parsed.
+
+        >>> next(c for c in student.iter_ge_courses() if c.code == "0349")
+        """
+        page = Page.of(raw_html or self.ge_get_list())
+        rows = (row for _, row in page.iter_rows(tables=GE_TABLES))
+        yield from _courses(page, rows)
+
     @staticmethod
     def ge_get_df(raw_html):
-        soup = bs4.BeautifulSoup(raw_html, "lxml")
-        converters = {i: lambda x: str(x) for i in range(13)}
-        df = pd.concat(
-            [
-                pd.read_html(str(soup.find_all("table")[6]), converters=converters)[0],
-                pd.read_html(str(soup.find_all("table")[8]), converters=converters)[0],
-                pd.read_html(str(soup.find_all("table")[10]), converters=converters)[0],
-            ]
-        ).set_index(1)
-        return df
+        return to_dataframe(Student.ge_get_rows(raw_html)).set_index(1)
 
-    def add_course_from_ge(self, course_code):
-        ge_raw = self.ge_get_list()
-        course_table = self._get_add_course_form_table(ge_raw, "GE")
-        course_secret = self._course_code_to_secret(course_table, course_code)
+    @acad_required
+    def add_course_from_ge(self, course_code, index=None):
+        if index is None:
+            index = self.catalog.index("GE")
+        course_secret = index.secret(course_code)
 
-        resp_confirm = self.session.post(
-            _acad_url("ge_check"), data={"v_click": course_secret}
-        )
+        resp_confirm = self._post("ge_check", data={"v_click": course_secret})
         assert resp_confirm.status_code == 200
         assert course_code in resp_confirm.text
 
-        soup_confirm = bs4.BeautifulSoup(resp_confirm.text, "lxml")
-        confirm_code = soup_confirm.select_one("input[NAME='v_click']").attrs["value"]
-        resp_final = self.session.post(
-            _acad_url("ge_final"), data={"v_click": confirm_code}
-        )
+        confirm_code = Page.from_response(resp_confirm).inputs["v_click"]
+        resp_final = self._post("ge_final", data={"v_click": confirm_code})
         assert resp_final.status_code == 200
-        assert course_code in resp_final.text
 
-        soup = bs4.BeautifulSoup(resp_final.text, "lxml")
-        message = soup.find_all("table")[5].find_all("td")[11].string
-
-        if "加選成功" not in message:
-            raise RuntimeError(message)
-        return message
+        [result] = _results(Page.from_response(resp_final), [course_code])
+        if not result.outcome.ok:
+            raise EnrollmentError(result)
+        return result.message
 
+    @acad_required
     def acad_get_list(self):
-        page_dept_list = self.session.get(_acad_url("dept_list"))
+        page_dept_list = self._get("dept_list")
         assert page_dept_list.status_code == 200
         assert "系所必選修課程加選" in page_dept_list.text
 
@@ -465,97 +931,240 @@ class Student:
 
     @staticmethod
     def acad_get_df(raw_html):
-        soup = bs4.BeautifulSoup(raw_html, "lxml")
-        course_table = soup.find_all("form")[1]
-
-    #         converters = {i:lambda x: str(x) for i in range(13)}
-    #         df = pd.concat([
-    #             pd.read_html(str(soup.find_all("table")[6]), converters=converters)[0],
-    #             pd.read_html(str(soup.find_all("table")[8]), converters=converters)[0],
-    #             pd.read_html(str(soup.find_all("table")[10]), converters=converters)[0]
-    #         ]).set_index(1)
-    #         return course_table, df
-
-    def add_course_from_acad(self, course_code):
-        acad_raw = self.acad_get_list()
-        course_table = self._get_add_course_form_table(acad_raw, "ACAD")
-        course_secret = self._course_code_to_secret(course_table, course_code)
-
-        resp_confirm = self.session.post(
-            _acad_url("dept_check"), data={"v_tick": course_secret}
-        )
+        return CourseIndex.from_page(raw_html, "ACAD").to_dataframe()
+
+    @acad_required
+    def add_course_from_acad(self, course_code, index=None):
+        if index is None:
+            index = self.catalog.index("ACAD")
+        course_secret = index.secret(course_code)
+
+        resp_confirm = self._post("dept_check", data={"v_tick": course_secret})
         assert resp_confirm.status_code == 200
         assert course_code in resp_confirm.text
 
-        resp_final = self.session.post(
-            _acad_url("dept_final"),
+        resp_final = self._post(
+            "dept_final",
             data={
                 "p_stud_no": self.username,
                 "v_tick": course_secret,
             },
         )
         assert resp_final.status_code == 200
-        assert course_code in resp_final.text
-
-        soup = bs4.BeautifulSoup(resp_final.text, "lxml")
-        message = soup.find_all("table")[6].find_all("td")[7].string
 
-        if "加選成功" not in message:
-            raise RuntimeError(message)
-        return message
+        [result] = _results(Page.from_response(resp_final), [course_code])
+        if not result.outcome.ok:
+            raise EnrollmentError(result)
+        return result.message
 
-    def add_course_with_codes(self, course_codes):
-        r1 = self.session.get(_acad_url("direct_list"))
+    def _direct_list(self):
+        r1 = self._get("direct_list")
         assert r1.status_code == 200
         assert "選課號碼加選" in r1.text
 
-        data_confirm = {"V_WANT": code for code in course_codes}
-        page_confirm = self.session.post(_acad_url("direct_check"), data=data_confirm)
-        assert page_confirm.status_code == 200
-        for code in course_codes:
-            assert code in page_confirm.text
+    def _add_batch(self, course_codes, index):
+        self._direct_check(course_codes, index)
+        # Codes unknown to the system are not sent on to the final request
+        found = [code for code in course_codes if code in index]
+        results = self._direct_final(found, index) if found else []
+        return _with_not_found(course_codes, results)
 
-        course_table = self._get_add_course_form_table(page_confirm.text, "CODE")
-        course_secrets = [
-            self._course_code_to_secret(course_table, code) for code in course_codes
-        ]
+    def _direct_final(self, course_codes, index):
+        data_final = self._direct_final_data(course_codes, index)
+        try:
+            resp_final = self._post("direct_final", data=data_final)
+        except OutcomeUnknownError as error:
+            # Not sent again, the courses may well be added already
+            return [
+                CourseResult(code, Outcome.UNKNOWN, str(error)) for code in course_codes
+            ]
+        return self._direct_results(course_codes, resp_final)
+
+    def _direct_final_data(self, course_codes, index):
+        data_final = [("v_tick", index.secret(code)) for code in course_codes]
+        data_final.append(("p_stud_no", self.username))
+        return data_final
 
-        data_final = {"v_tick": secret for secret in course_secrets}
-        data_final["p_stud_no"] = self.username
-        resp_final = self.session.post(_acad_url("direct_final"), data=data_final)
+    @staticmethod
+    def _direct_results(course_codes, resp_final):
         assert resp_final.status_code == 200
-        for code in course_codes:
-            assert code in resp_final.text
+        return _results(Page.from_response(resp_final), course_codes)
+
+    @acad_required
+    def add_courses(self, course_codes, index=None):
+        """Add courses by code, return the CODE index and a CourseResult each
+
+        Codes are sent DIRECT_BATCH_SIZE at a time, each batch as one check
+        and one final request. Batches run one after another: a final follows
+        its own check in the same session, so batches are never interleaved.
+        """
+        if index is None:
+            index = CourseIndex("CODE")
+        self._direct_list()
+        results = []
+        for batch in _chunks(course_codes, DIRECT_BATCH_SIZE):
+            results += self._add_batch(batch, index)
+        return index, results
+
+    def add_course_with_codes(self, course_codes, index=None):
+        """Add courses by code, return the CODE index and result messages"""
+        index, results = self.add_courses(course_codes, index)
+        return index, [result.message for result in results]
+
+    def _check_codes(self, course_codes, index):
+        """Look up codes through direct check pages, return codes that changed"""
+        self._direct_list()
+
+        changed = []
+        for batch in _chunks(course_codes, DIRECT_BATCH_SIZE):
+            changed += self._direct_check(batch, index)
+        return changed
+
+    def _direct_check(self, course_codes, index):
+        """Check a batch of codes, merge them into index and return changes
+
+        Polling the same codes mostly gets the same page back, which is then
+        not parsed again (see self.responses).
+        """
 
-        soup = bs4.BeautifulSoup(resp_final.text, "lxml")
-        messages = []
-        for row in soup.find_all("table")[0].find_all("tr")[:-1]:
-            messages.append(row.find_all("td")[7].string)
-        return course_table, messages
+        def parse_check(response):
+            assert response.status_code == 200
+            return CourseIndex.parse(Page.from_response(response), "CODE")
 
-    def remove_course(self, course_code):
-        url_list = _acad_url("delete_list")
-        url_check = _acad_url("delete_check")
-        url_final = _acad_url("delete_final")
+        data = [("V_WANT", code) for code in course_codes]
+        return index.merge(self._parsed("POST", "direct_check", parse_check, data))
 
-        resp_list = self.session.get(url_list)
+    @acad_required
+    def get_seat_status(self, course_codes, index=None):
+        """Available and selected seats of courses, mapped by course code
+
+        Codes are checked DIRECT_BATCH_SIZE at a time, codes unknown to the
+        system are left out.
+        """
+        if index is None:
+            index = CourseIndex("CODE")
+        self._check_codes(course_codes, index)
+        return {code: index[code].seats for code in course_codes if code in index}
+
+    @acad_required
+    def watch_seats(self, course_codes, interval=60):
+        """Poll seats every interval seconds, yield SeatStatus that changed"""
+        index = CourseIndex("CODE")
+        last = {}
+        while True:
+            for code in self._check_codes(course_codes, index):
+                seats = index[code].seats
+                if last.get(code) != seats:
+                    last[code] = seats
+                    yield seats
+            sleep(interval)
+
+    @acad_required
+    def delete_get_list(self):
+        resp_list = self._get("delete_list")
         assert resp_list.status_code == 200
         assert "課程退選" in resp_list.text
 
-        course_table = self._get_add_course_form_table(resp_list.text, "DROP")
-        course_secret = self._course_code_to_secret(course_table, course_code)
+        return resp_list.text
+
+    @acad_required
+    def remove_course(self, course_code, index=None):
+        if index is None:
+            index = self.get_course_index("DROP")
+        course_secret = index.secret(course_code)
+        if course_secret is None:
+            message = f"<{course_code}> is not in the drop list"
+            raise EnrollmentError(
+                CourseResult(course_code, Outcome.NOT_ENROLLED, message)
+            )
+        self._delete_check(course_code, course_secret)
+        result = self._delete_final(course_code, course_secret)
+
+        if not result.outcome.ok:
+            raise EnrollmentError(result)
+        return result.message
 
-        page_confirm = self.session.post(url_check, data={"v_del": course_secret})
+    def _delete_check(self, course_code, course_secret):
+        page_confirm = self._post("delete_check", data={"v_del": course_secret})
         assert page_confirm.status_code == 200
         assert course_code in page_confirm.text
 
-        resp_final = self.session.post(url_final, data={"v_del": course_secret})
+    def _delete_final(self, course_code, course_secret):
+        resp_final = self._post("delete_final", data={"v_del": course_secret})
         assert resp_final.status_code == 200
-        assert course_code in resp_final.text
 
-        soup = bs4.BeautifulSoup(resp_final.text, "lxml")
-        message = soup.find_all("table")[1].find_all("td")[6].string
+        [result] = _results(Page.from_response(resp_final), [course_code])
+        return result
 
-        if "退選成功" not in message:
-            raise RuntimeError(message)
-        return message
+    @acad_required
+    def swap_course(self, drop_code, add_code):
+        """Drop a course and add another with as little time between as possible
+
+        Every list, check and secret is fetched first, so once the drop is
+        sent only the add (and, if it fails, re-adding the dropped course)
+        is left. Returns a SwapResult with how long neither seat was held.
+        Raises EnrollmentError if the drop fails (nothing changed then),
+        OutcomeUnknownError if the drop got no answer (check the drop list),
+        or SwapError if the add and the rollback both failed, or if whether
+        the add went through is unknown (no rollback is sent then).
+        """
+        drop_secret = self.get_course_index("DROP").secret(drop_code)
+        if drop_secret is None:
+            message = f"<{drop_code}> is not in the drop list"
+            raise EnrollmentError(
+                CourseResult(drop_code, Outcome.NOT_ENROLLED, message)
+            )
+
+        # Check the dropped course too, so its secret is at hand for rollback
+        index = CourseIndex("CODE")
+        self._direct_list()
+        page_check = self._post(
+            "direct_check", data=[("V_WANT", add_code), ("V_WANT", drop_code)]
+        )
+        assert page_check.status_code == 200
+        index.update(Page.from_response(page_check))
+        if add_code not in index:
+            message = f"<{add_code}> cannot be found"
+            raise EnrollmentError(CourseResult(add_code, Outcome.NOT_FOUND, message))
+        if drop_code not in index:
+            # Without its secret a failed add could not be rolled back
+            message = f"<{drop_code}> cannot be re-added, not swapping"
+            raise EnrollmentError(CourseResult(drop_code, Outcome.NOT_FOUND, message))
+
+        # The drop check and final go back to back, as a workflow of their own.
+        # The direct final only needs the secrets of its check (like the ones
+        # PreArmedAdd prepares in advance), so the drop may run in between
+        self._delete_check(drop_code, drop_secret)
+
+        # Critical section, from here on neither seat may be held
+        start = perf_counter()
+        dropped = self._delete_final(drop_code, drop_secret)
+        if not dropped.outcome.ok:
+            raise EnrollmentError(dropped)
+        [added] = self._direct_final([add_code], index)
+        if added.outcome.ok:
+            window = perf_counter() - start
+            return SwapResult(True, dropped.message, added.message, None, window)
+        if added.outcome is Outcome.UNKNOWN:
+            window = perf_counter() - start
+            result = SwapResult(False, dropped.message, added.message, None, window)
+            raise SwapError(f"Unknown whether <{add_code}> was added", result)
+
+        logger.info(
+            "Adding <%s> failed (%s), re-add <%s>", add_code, added.message, drop_code
+        )
+        try:
+            [rollback] = self._direct_final([drop_code], index)
+        except Exception as error:
+            rollback = CourseResult(drop_code, Outcome.UNKNOWN, repr(error))
+        result = SwapResult(
+            False,
+            dropped.message,
+            added.message,
+            rollback.message,
+            perf_counter() - start,
+        )
+        if not rollback.outcome.ok:
+            message = f"Rollback of <{drop_code}> failed: {rollback.message}"
+            raise SwapError(message, result)
+        return result
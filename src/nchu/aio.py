@@ -0,0 +1,151 @@
+"""Asyncio interface for accessing NCHU Portal System"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from . import FillingPolicy, Student
+from .transport import Transport
+
+try:
+    from asyncio import get_running_loop
+except ImportError:  # Python 3.6
+    from asyncio import get_event_loop as get_running_loop
+
+
+class Pool:
+    """Bounded keep-alive connection pool shared by many AsyncStudent
+
+    Every student keeps its own cookies, but all of them borrow connections
+    from the same adapter, so at most ``max_connections`` sockets are opened
+    per host no matter how many accounts or course checks are in flight.
+    """
+
+    def __init__(self, max_connections=10, max_workers=None, transport=None):
+        self.max_connections = max_connections
+        self.transport = transport or Transport(
+            pool_maxsize=max_connections, pool_block=True
+        )
+        self.adapter = self.transport.adapter()
+        self.executor = ThreadPoolExecutor(max_workers or max_connections)
+
+    async def run(self, func, *args, **kwargs):
+        loop = get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def student(self, username, password, **kwargs):
+        return await AsyncStudent.login(username, password, pool=self, **kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.adapter.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+_default_pool = None
+
+
+def default_pool():
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = Pool()
+    return _default_pool
+
+
+class AsyncStudent:
+    """Awaitable counterpart of nchu.Student
+
+    >>> async with Pool(max_connections=20) as pool:
+    ...     students = await asyncio.gather(
+    ...         *[pool.student(username, password) for username, password in accounts]
+    ...     )
+    ...     await asyncio.gather(*[s.add_course_with_codes(codes) for s in students])
+    """
+
+    def __init__(self, student, pool=None):
+        self.student = student
+        self.pool = pool or default_pool()
+
+    @classmethod
+    async def login(cls, username, password, pool=None, **kwargs):
+        """Login on the pool, kwargs are passed on to Student"""
+        pool = pool or default_pool()
+        kwargs.setdefault("transport", pool.transport)
+        student = await pool.run(
+            Student, username, password, adapter=pool.adapter, **kwargs
+        )
+        return cls(student, pool)
+
+    @property
+    def username(self):
+        return self.student.username
+
+    #
+    # Login Methods
+    #
+
+    async def login_sso(self):
+        return await self.pool.run(self.student.login_sso)
+
+    async def login_acad(self):
+        return await self.pool.run(self.student.login_acad)
+
+    #
+    # Questionnaire methods
+    #
+
+    async def get_questionnaire(self):
+        return await self.pool.run(self.student.get_questionnaire)
+
+    async def fill_questionnaire(self, questionnaire, policy=FillingPolicy.GREAT):
+        return await self.pool.run(
+            self.student.fill_questionnaire, questionnaire, policy
+        )
+
+    async def get_ta_questionnaire(self):
+        return await self.pool.run(self.student.get_ta_questionnaire)
+
+    async def fill_ta_questionnaire(self, ta_questionnaire, policy=FillingPolicy.GREAT):
+        return await self.pool.run(
+            self.student.fill_ta_questionnaire, ta_questionnaire, policy
+        )
+
+    async def fill_all_questionnaires(self, policy=FillingPolicy.GREAT):
+        return await self.pool.run(self.student.fill_all_questionnaires, policy)
+
+    async def fill_all_ta_questionnaires(self, policy=FillingPolicy.GREAT):
+        return await self.pool.run(self.student.fill_all_ta_questionnaires, policy)
+
+    #
+    # Add/Drop Course Methods
+    #
+
+    async def ge_get_list(self):
+        return await self.pool.run(self.student.ge_get_list)
+
+    async def add_course_from_ge(self, course_code):
+        return await self.pool.run(self.student.add_course_from_ge, course_code)
+
+    async def acad_get_list(self):
+        return await self.pool.run(self.student.acad_get_list)
+
+    async def add_course_from_acad(self, course_code):
+        return await self.pool.run(self.student.add_course_from_acad, course_code)
+
+    async def add_course_with_codes(self, course_codes):
+        return await self.pool.run(self.student.add_course_with_codes, course_codes)
+
+    async def add_courses(self, course_codes):
+        return await self.pool.run(self.student.add_courses, course_codes)
+
+    async def get_seat_status(self, course_codes):
+        return await self.pool.run(self.student.get_seat_status, course_codes)
+
+    async def remove_course(self, course_code):
+        return await self.pool.run(self.student.remove_course, course_code)
+
+    async def swap_course(self, drop_code, add_code):
+        return await self.pool.run(self.student.swap_course, drop_code, add_code)
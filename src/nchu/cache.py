@@ -0,0 +1,105 @@
+"""Fingerprints of polled responses, to skip parsing pages that did not change"""
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, NamedTuple, Optional
+
+
+class Entry(NamedTuple):
+    digest: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    value: Any
+
+
+def fingerprint(content):
+    return blake2b(content, digest_size=16).digest()
+
+
+class ResponseCache:
+    """Parsed result of the last response of every polled request
+
+    Requests are keyed on method, endpoint and form data. A response whose
+    body hashes the same as the last one is not parsed again, the result
+    parsed from the last one is returned instead. Validators (ETag,
+    Last-Modified) of a response are sent back as conditional headers, so a
+    server honoring them answers 304 without a body at all.
+
+    >>> student.get_seat_status(["0349"])
+    >>> student.responses.hit_rate
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.entries = OrderedDict()
+            self.hits = 0
+            self.not_modified = 0
+            self.misses = 0
+
+    @staticmethod
+    def key(method, endpoint, data=None):
+        if isinstance(data, dict):
+            data = data.items()
+        return method, endpoint, tuple(data or ())
+
+    def headers(self, key):
+        """Conditional headers for a request, from its last response"""
+        with self._lock:
+            entry = self.entries.get(key)
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def resolve(self, key, response, parse):
+        """Result of parse(response), reused if the response did not change"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and response.status_code == 304:
+                self.not_modified += 1
+                self.entries.move_to_end(key)
+                return entry.value
+            digest = fingerprint(response.content)
+            if entry and entry.digest == digest:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry.value
+            self.misses += 1
+
+        value = parse(response)
+        with self._lock:
+            self.entries[key] = Entry(
+                digest,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                value,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    @property
+    def hit_rate(self):
+        """Fraction of responses not parsed again, 0.0 before any"""
+        total = self.hits + self.not_modified + self.misses
+        return (self.hits + self.not_modified) / total if total else 0.0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self.entries),
+        }
+
+    def __repr__(self):
+        return f"<ResponseCache {len(self.entries)} entries, {self.hit_rate:.0%} hits>"
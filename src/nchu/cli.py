@@ -0,0 +1,294 @@
+"""Command line interface for scripted batch operations
+
+    nchu seats 0349 1159
+    nchu add 0349 1159 | jq 'select(.outcome == "added")'
+    nchu swap 0348 0349
+    nchu questionnaire fill-all
+    nchu catalog dump GE --json > ge.json
+
+Credentials are read from NCHU_USERNAME and NCHU_PASSWORD, or from a JSON
+credentials file (``~/.nchu/credentials.json`` unless NCHU_CREDENTIALS or
+``--credentials`` says otherwise), never prompted for. Sessions are kept in
+``~/.nchu/sessions``, so most runs skip logging in. Records are printed as
+NDJSON, one per line, or as one JSON array with ``--json``; diagnostics go to
+stderr only. A command cut short by an error prints one record with an
+``error`` key instead. The exit status is 0 when everything succeeded, 1 when
+any operation failed and 2 on usage, credential or login errors.
+"""
+import argparse
+import json
+import logging
+import os
+import stat
+import sys
+from pathlib import Path
+
+import requests
+
+from . import (
+    CourseResult,
+    EnrollmentError,
+    FillingPolicy,
+    FunctionClosedError,
+    Outcome,
+    OutcomeUnknownError,
+    SessionExpiredError,
+    Student,
+    SwapError,
+)
+from .session import SessionStore
+
+DEFAULT_CREDENTIALS = Path.home() / ".nchu" / "credentials.json"
+
+
+class CredentialsError(Exception):
+    pass
+
+
+def load_credentials(path=None, username=None):
+    """(username, password) from the environment or a credentials file
+
+    The file holds either ``{"username": ..., "password": ...}`` or a mapping
+    of usernames to passwords, of which ``username`` (or the only one) is
+    taken.
+    """
+    username = username or os.environ.get("NCHU_USERNAME")
+    password = os.environ.get("NCHU_PASSWORD")
+    if username and password:
+        return username, password
+
+    path = Path(path or os.environ.get("NCHU_CREDENTIALS") or DEFAULT_CREDENTIALS)
+    try:
+        with open(path) as f:
+            record = json.load(f)
+        mode = os.stat(path).st_mode
+    except (OSError, ValueError) as error:
+        raise CredentialsError(f"Cannot read credentials from {path}: {error}")
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        logging.warning("%s is accessible by other users, chmod 600 it", path)
+
+    if "password" in record:
+        return record["username"], record["password"]
+    if username is None and len(record) == 1:
+        [username] = record
+    if username not in record:
+        raise CredentialsError(f"No password of <{username}> in {path}")
+    return username, record[username]
+
+
+def _student(args):
+    username, password = load_credentials(args.credentials, args.username)
+    store = None if args.no_session else SessionStore()
+    return Student(username, password, session_store=store)
+
+
+#
+# Commands, each returns records to print and whether all of them succeeded
+#
+
+
+def seats(args):
+    status = _student(args).get_seat_status(args.codes)
+    records = []
+    for code in args.codes:
+        record = {"code": code, "found": code in status}
+        if code in status:
+            record["available"] = status[code].available
+            record["selected"] = status[code].selected
+            record["vacant"] = status[code].vacant
+        records.append(record)
+    return records, len(status) == len(args.codes)
+
+
+def _result(result):
+    return {
+        "code": result.code,
+        "outcome": result.outcome.value,
+        "message": result.message,
+    }
+
+
+def add(args):
+    _, results = _student(args).add_courses(args.codes)
+    return [_result(result) for result in results], all(
+        result.outcome.ok for result in results
+    )
+
+
+def drop(args):
+    student = _student(args)
+    results = []
+    for code in args.codes:
+        try:
+            message = student.remove_course(code)
+            results.append(CourseResult(code, Outcome.DROPPED, message))
+        except EnrollmentError as error:
+            results.append(error.result)
+        # Reported per code, so the codes dropped before are not lost
+        except OutcomeUnknownError as error:
+            results.append(CourseResult(code, Outcome.UNKNOWN, str(error)))
+        except FunctionClosedError as error:
+            results.append(CourseResult(code, Outcome.CLOSED, str(error)))
+    return [_result(result) for result in results], all(
+        result.outcome.ok for result in results
+    )
+
+
+def swap(args):
+    try:
+        result = _student(args).swap_course(args.drop, args.add)
+    except EnrollmentError as error:
+        return [{"swapped": False, **_result(error.result)}], False
+    except SwapError as error:
+        return [{**error.result._asdict(), "error": str(error)}], False
+    return [result._asdict()], result.swapped
+
+
+def _fill_all(method):
+    def command(args):
+        policy = FillingPolicy[args.policy]
+        report = getattr(_student(args), method)(policy)
+        records = [
+            {
+                "questionnaire": result.questionnaire,
+                "filled": result.filled,
+                "error": None if result.error is None else repr(result.error),
+            }
+            for result in report
+        ]
+        return records, all(result.filled for result in report)
+
+    return command
+
+
+def catalog_dump(args):
+    index = _student(args).catalog.index(args.method)
+    records = [
+        {
+            "code": course.code,
+            "available": course.available,
+            "selected": course.selected,
+            "cells": course.cells,
+        }
+        for course in index
+    ]
+    return records, True
+
+
+#
+# Entry point
+#
+
+
+def _print(records, as_array):
+    if as_array:
+        json.dump(records, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    for record in records:
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _fail(error, status, as_array):
+    logging.error("%s: %s", error.__class__.__name__, error)
+    logging.debug("Command failed", exc_info=True)
+    _print([{"error": error.__class__.__name__, "message": str(error)}], as_array)
+    return status
+
+
+def _parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--credentials", metavar="PATH", help="credentials file")
+    common.add_argument("--username", help="account to pick from the file")
+    common.add_argument(
+        "--no-session", action="store_true", help="log in without saving a session"
+    )
+    common.add_argument(
+        "--json", action="store_true", help="print one JSON array instead of NDJSON"
+    )
+    common.add_argument("-v", "--verbose", action="store_true")
+
+    parser = argparse.ArgumentParser(
+        prog="nchu",
+        description=__doc__.splitlines()[0],
+        epilog="Credentials are read from NCHU_USERNAME and NCHU_PASSWORD, or "
+        "from a credentials file.",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser(
+        "seats", parents=[common], help="seats of courses by code"
+    )
+    command.add_argument("codes", nargs="+", metavar="code")
+    command.set_defaults(func=seats)
+
+    command = commands.add_parser("add", parents=[common], help="add courses by code")
+    command.add_argument("codes", nargs="+", metavar="code")
+    command.set_defaults(func=add)
+
+    command = commands.add_parser("drop", parents=[common], help="drop courses")
+    command.add_argument("codes", nargs="+", metavar="code")
+    command.set_defaults(func=drop)
+
+    command = commands.add_parser(
+        "swap", parents=[common], help="drop a course and add another"
+    )
+    command.add_argument("drop")
+    command.add_argument("add")
+    command.set_defaults(func=swap)
+
+    for name, method in (
+        ("questionnaire", "fill_all_questionnaires"),
+        ("ta-questionnaire", "fill_all_ta_questionnaires"),
+    ):
+        group = commands.add_parser(name, help=f"{name}s of this semester")
+        actions = group.add_subparsers(dest="action", metavar="action")
+        actions.required = True
+        command = actions.add_parser(
+            "fill-all", parents=[common], help="fill every pending one"
+        )
+        command.add_argument(
+            "--policy", choices=["AWFUL", "NEUTRAL", "GREAT"], default="GREAT"
+        )
+        command.set_defaults(func=_fill_all(method))
+
+    group = commands.add_parser("catalog", help="GE and dept course lists")
+    actions = group.add_subparsers(dest="action", metavar="action")
+    actions.required = True
+    command = actions.add_parser(
+        "dump", parents=[common], help="every course of a list"
+    )
+    command.add_argument("method", nargs="?", choices=["GE", "ACAD"], default="GE")
+    command.set_defaults(func=catalog_dump)
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
+    )
+    try:
+        records, ok = args.func(args)
+    except CredentialsError as error:
+        return _fail(error, 2, args.json)
+    except ValueError as error:
+        if str(error) != "Incorrect password":
+            raise
+        return _fail(error, 2, args.json)
+    except (
+        AssertionError,
+        FunctionClosedError,
+        SessionExpiredError,
+        OutcomeUnknownError,
+        requests.RequestException,
+    ) as error:
+        return _fail(error, 1, args.json)
+    _print(records, args.json)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Course listings of NCHU Portal System"""
+import re
+import threading
+from time import monotonic
+from typing import NamedTuple, Optional, Tuple
+
+from .cache import fingerprint
+from .page import Page
+
+# Index of the form listing courses in each list page
+COURSE_FORM = {
+    "GE": 1,
+    "ACAD": 1,
+    "CODE": 0,
+    "DROP": 0,
+}
+# Columns of each course row
+CODE_COLUMN = 1
+AVAILABLE_COLUMN = 8
+SELECTED_COLUMN = 9
+
+_FORM_START = re.compile(r"<form\b", re.IGNORECASE)
+_FORM_END = re.compile(r"</form\s*>", re.IGNORECASE)
+_TABLE_START = re.compile(r"<table\b", re.IGNORECASE)
+
+
+def to_dataframe(records, index=None):
+    """DataFrame of records (named tuples, dicts or plain rows)
+
+    pandas is only imported here, install it with ``nchu-sdk[dataframe]``.
+    """
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError(
+            "to_dataframe requires pandas, install nchu-sdk[dataframe]"
+        ) from e
+    df = pd.DataFrame(list(records))
+    return df.set_index(index) if index is not None else df
+
+
+def _seat(cells, index):
+    try:
+        return int(cells[index])
+    except (IndexError, ValueError):
+        return None
+
+
+class SeatStatus(NamedTuple):
+    code: str
+    available: Optional[int]
+    selected: Optional[int]
+
+    @property
+    def vacant(self):
+        if self.available is None or self.selected is None:
+            return False
+        return self.available > self.selected
+
+
+class Course(NamedTuple):
+    code: str
+    secret: str
+    available: Optional[int]
+    selected: Optional[int]
+    cells: Tuple[str, ...]
+
+    @property
+    def seats(self):
+        return SeatStatus(self.code, self.available, self.selected)
+
+    @property
+    def vacant(self):
+        return self.seats.vacant
+
+
+def _courses(page, rows):
+    """Course of every row with a code and a selection field"""
+    for row in rows:
+        cells = page.find_all(row, "td")
+        field = page.find(row, "input")
+        if len(cells) <= CODE_COLUMN or field is None:
+            continue
+        cells = tuple(page.text(cell) for cell in cells)
+        yield Course(
+            code=cells[CODE_COLUMN],
+            secret=page.attr(field, "value"),
+            available=_seat(cells, AVAILABLE_COLUMN),
+            selected=_seat(cells, SELECTED_COLUMN),
+            cells=cells,
+        )
+
+
+class CourseIndex:
+    """Course code to secret, seat counts and row of a course list page
+
+    Built in one pass over the course form of a GE, ACAD (dept), CODE (direct)
+    or DROP list page, so looking up any number of codes costs O(1) each.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.courses = {}
+
+    @classmethod
+    def from_page(cls, page, method):
+        index = cls(method)
+        index.update(page)
+        return index
+
+    def update(self, page):
+        """Merge the rows of a newer list page, return codes that changed
+
+        Rows identical to the indexed ones are kept as-is, so refreshing an
+        index with a page of a few codes (e.g. one direct check) is cheap.
+        """
+        page = Page.of(page)
+        return self.merge(_courses(page, page.rows(form=COURSE_FORM[self.method])))
+
+    def merge(self, courses):
+        """Merge already parsed courses, return codes that changed"""
+        changed = []
+        for course in courses:
+            if self.courses.get(course.code) == course:
+                continue
+            self.courses[course.code] = course
+            changed.append(course.code)
+        return changed
+
+    @classmethod
+    def parse(cls, page, method):
+        """Courses of a list page, to be merged into indexes later"""
+        page = Page.of(page)
+        return list(_courses(page, page.rows(form=COURSE_FORM[method])))
+
+    def secret(self, code):
+        course = self.courses.get(code)
+        return course.secret if course else None
+
+    def get(self, code, default=None):
+        return self.courses.get(code, default)
+
+    def __getitem__(self, code):
+        return self.courses[code]
+
+    def __contains__(self, code):
+        return code in self.courses
+
+    def __iter__(self):
+        return iter(self.courses.values())
+
+    def __len__(self):
+        return len(self.courses)
+
+    def to_dataframe(self):
+        return to_dataframe(self, index="code")
+
+    def __repr__(self):
+        return f"<CourseIndex {self.method} ({len(self)} courses)>"
+
+
+class CourseChange(NamedTuple):
+    """A course added (before is None), removed (after is None) or updated"""
+
+    code: str
+    before: Optional[Course]
+    after: Optional[Course]
+
+
+def _sections(html, form):
+    """Raw HTML of each table within the form of given index"""
+    starts = list(_FORM_START.finditer(html))
+    if len(starts) <= form:
+        return []
+    start = starts[form].start()
+    end = _FORM_END.search(html, start)
+    body = html[start : end.start() if end else len(html)]
+    bounds = [match.start() for match in _TABLE_START.finditer(body)]
+    return [body[a:b] for a, b in zip(bounds, bounds[1:] + [len(body)])]
+
+
+class CourseCatalog:
+    """GE and dept (ACAD) course lists, cached for ttl seconds
+
+    Each list is refetched at most once per ttl. On refresh, a page identical
+    to the last fetch is skipped as a whole, otherwise the tables of the
+    course form are hashed and only those that differ from the last fetch are
+    parsed again, so a refresh where only some seat counts moved costs a
+    fraction of parsing the whole list.
+
+    >>> student.catalog.index("GE")["0349"].vacant
+    >>> for change in student.catalog.refresh("GE"):
+    ...     print(change.code, change.before, change.after)
+    """
+
+    def __init__(self, fetch, ttl=60):
+        # method: function returning the raw HTML of its list page
+        self.fetch = fetch
+        self.ttl = ttl
+        self.indexes = {}
+        self.changes = {}
+        self._fetched = {}
+        self._sections = {}
+        self._digests = {}
+        self._lock = threading.RLock()
+
+    def index(self, method):
+        """CourseIndex of a list, refreshed if older than ttl"""
+        with self._lock:
+            fetched = self._fetched.get(method)
+            if fetched is None or monotonic() - fetched >= self.ttl:
+                self.refresh(method)
+            return self.indexes[method]
+
+    __getitem__ = index
+
+    def invalidate(self, method=None):
+        """Refetch a list (or all of them) on next access"""
+        with self._lock:
+            for key in [method] if method else list(self._fetched):
+                self._fetched.pop(key, None)
+
+    def refresh(self, method):
+        """Refetch a list now, return CourseChange of every row that changed"""
+        if method not in self.fetch:
+            raise ValueError(f"Cannot list courses of method <{method}>")
+        with self._lock:
+            html = self.fetch[method]()
+            self._fetched[method] = monotonic()
+            index = self.indexes.setdefault(method, CourseIndex(method))
+            digest = fingerprint(html.encode())
+            if self._digests.get(method) == digest:
+                self.changes[method] = []
+                return []
+            self._digests[method] = digest
+            known = self._sections.get(method, {})
+            sections = {}
+            changes = []
+            for section in _sections(html, COURSE_FORM[method]):
+                digest = fingerprint(section.encode())
+                if digest in known:
+                    sections[digest] = known[digest]
+                    continue
+                page = Page.of(section)
+                courses = list(_courses(page, page.find_all(page.root, "tr")))
+                sections[digest] = [course.code for course in courses]
+                for course in courses:
+                    before = index.get(course.code)
+                    if before != course:
+                        index.courses[course.code] = course
+                        changes.append(CourseChange(course.code, before, course))
+
+            listed = {code for codes in sections.values() for code in codes}
+            for code in [code for code in index.courses if code not in listed]:
+                changes.append(CourseChange(code, index.courses.pop(code), None))
+            self._sections[method] = sections
+            self.changes[method] = changes
+            return changes
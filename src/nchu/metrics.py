@@ -0,0 +1,163 @@
+"""Per-request metrics of Student, exportable as a dict or Prometheus text"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+# Upper bounds of latency buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Upper bounds of response size buckets, in bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class RequestEvent(NamedTuple):
+    """One HTTP request of a Student, as passed to every hook
+
+    ``endpoint`` is the ACAD_MAP key, or host and path for requests outside
+    ACAD (SSO, Portal). ``attempt`` counts retries, 0 on the first try.
+    ``outcome`` is one of ``ok``, ``expired``, ``closed``, ``server_error``
+    or ``error`` (no response at all, ``status`` is None then).
+    """
+
+    username: str
+    endpoint: str
+    method: str
+    status: Optional[int]
+    bytes: int
+    elapsed: float
+    queued: float
+    attempt: int
+    outcome: str
+
+
+class Histogram:
+    """Cumulative histogram over fixed upper bounds, like Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, count of observations <= bound) pairs, +Inf last"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def as_dict(self):
+        return {
+            "buckets": {_bound(bound): count for bound, count in self.cumulative()},
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _labels(**labels):
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+class MetricsCollector:
+    """In-memory hook keeping per-endpoint counters and histograms
+
+    >>> metrics = MetricsCollector()
+    >>> student = Student(username, password, hooks=[metrics])
+    >>> student.add_course_with_codes(["0349"])
+    >>> print(metrics.to_prometheus())
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.retries = defaultdict(int)
+            self.latency = defaultdict(lambda: Histogram(self.latency_buckets))
+            self.queued = defaultdict(float)
+            self.size = defaultdict(lambda: Histogram(self.size_buckets))
+
+    def __call__(self, event):
+        with self._lock:
+            self.requests[event.endpoint, event.outcome] += 1
+            if event.attempt:
+                self.retries[event.endpoint] += 1
+            self.latency[event.endpoint].observe(event.elapsed)
+            self.queued[event.endpoint] += event.queued
+            if event.status is not None:
+                self.size[event.endpoint].observe(event.bytes)
+
+    def as_dict(self):
+        """Every metric keyed by endpoint"""
+        with self._lock:
+            endpoints = {}
+            for (endpoint, outcome), count in self.requests.items():
+                metrics = endpoints.setdefault(endpoint, {"requests": {}})
+                metrics["requests"][outcome] = count
+            for endpoint, metrics in endpoints.items():
+                metrics["retries"] = self.retries.get(endpoint, 0)
+                metrics["queued_seconds"] = self.queued.get(endpoint, 0.0)
+                metrics["latency_seconds"] = self.latency[endpoint].as_dict()
+                if endpoint in self.size:
+                    metrics["response_bytes"] = self.size[endpoint].as_dict()
+            return endpoints
+
+    def to_prometheus(self, prefix="nchu"):
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                f"# HELP {prefix}_requests_total Requests by endpoint and outcome",
+                f"# TYPE {prefix}_requests_total counter",
+            ]
+            for (endpoint, outcome), count in sorted(self.requests.items()):
+                labels = _labels(endpoint=endpoint, outcome=outcome)
+                lines.append(f"{prefix}_requests_total{labels} {count}")
+
+            lines += [
+                f"# HELP {prefix}_retries_total Retried requests by endpoint",
+                f"# TYPE {prefix}_retries_total counter",
+            ]
+            for endpoint, count in sorted(self.retries.items()):
+                labels = _labels(endpoint=endpoint)
+                lines.append(f"{prefix}_retries_total{labels} {count}")
+
+            lines += [
+                f"# HELP {prefix}_queued_seconds_total Time waited for rate limits",
+                f"# TYPE {prefix}_queued_seconds_total counter",
+            ]
+            for endpoint, seconds in sorted(self.queued.items()):
+                labels = _labels(endpoint=endpoint)
+                lines.append(f"{prefix}_queued_seconds_total{labels} {seconds}")
+
+            for name, help_text, histograms in (
+                ("request_seconds", "Request latency", self.latency),
+                ("response_bytes", "Response size", self.size),
+            ):
+                lines += [
+                    f"# HELP {prefix}_{name} {help_text} by endpoint",
+                    f"# TYPE {prefix}_{name} histogram",
+                ]
+                for endpoint, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        labels = _labels(endpoint=endpoint, le=_bound(bound))
+                        lines.append(f"{prefix}_{name}_bucket{labels} {count}")
+                    labels = _labels(endpoint=endpoint)
+                    lines.append(f"{prefix}_{name}_sum{labels} {histogram.sum}")
+                    lines.append(f"{prefix}_{name}_count{labels} {histogram.count}")
+            return "\n".join(lines) + "\n"
@@ -0,0 +1,663 @@
+"""Monitor course seats and add courses as soon as a seat frees up
+
+    NCHU_USERNAME=4107056000 NCHU_PASSWORD=... python -m nchu.monitor \\
+        --watch monitoring.json --webhook https://example.com/hook
+
+The watch file is a JSON list of course codes, reloaded whenever it changes.
+Seats, added courses and the current interval are written to the state file
+after every poll. With ``--workers``, the watch list is split over that many
+processes, each logged in on its own.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import shlex
+import sys
+import zlib
+from datetime import datetime
+from getpass import getpass
+from pathlib import Path
+from queue import Empty
+from time import monotonic, time
+from typing import NamedTuple, Optional
+
+import requests
+
+from . import Outcome, Student, ratelimit
+from .aio import AsyncStudent, Pool, get_running_loop
+from .course import CourseIndex
+from .session import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Hours of the day when seats move, polls are stretched outside of them
+PEAK_HOURS = range(8, 23)
+OFF_PEAK_FACTOR = 4
+# Seconds between checks of the watch file while waiting for the next poll
+WATCH_CHECK = 1
+# Times a dead worker is started again before its codes go to the others
+RESPAWNS = 3
+# Exit status of a worker whose password was refused, not started again
+CREDENTIALS_EXIT = 3
+
+
+class Event(NamedTuple):
+    # One of "vacant", "added", "add_failed" or "error"
+    kind: str
+    code: Optional[str]
+    message: str
+    time: float
+
+
+def write_json(path, data):
+    """Replace a JSON file atomically, readers never see half of it"""
+    path = Path(path)
+    temp = path.with_name(f".{path.name}.tmp")
+    with open(temp, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp, path)
+
+
+class AdaptiveInterval:
+    """Seconds between polls, following how volatile seats are
+
+    Halved whenever a seat count moved, grown back by half while nothing
+    changes, and stretched by off_peak_factor outside of peak_hours.
+    """
+
+    def __init__(
+        self,
+        base=60,
+        minimum=10,
+        maximum=600,
+        peak_hours=PEAK_HOURS,
+        off_peak_factor=OFF_PEAK_FACTOR,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.peak_hours = peak_hours
+        self.off_peak_factor = off_peak_factor
+        self.seconds = base
+
+    def update(self, changed):
+        if changed:
+            self.seconds = max(self.minimum, self.seconds / 2)
+        else:
+            self.seconds = min(self.maximum, self.seconds * 1.5)
+        return self.current()
+
+    def current(self, now=None):
+        hour = (now or datetime.now()).hour
+        if hour in self.peak_hours:
+            return self.seconds
+        return min(self.maximum, self.seconds * self.off_peak_factor)
+
+
+class WatchList:
+    """Course codes of a JSON file, reloaded when its mtime changes"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.codes = []
+        self._mtime = None
+
+    def reload(self):
+        """Read the file again if it changed, return whether it did"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path) as f:
+                codes = [str(code) for code in json.load(f)]
+        except ValueError as e:
+            # Probably caught half written, keep the last list until it is read again
+            logger.warning("Cannot read %s: %s", self.path, e)
+            return False
+        self._mtime = mtime
+        changed = codes != self.codes
+        self.codes = codes
+        return changed
+
+    def save(self, codes):
+        write_json(self.path, codes)
+        self.codes = list(codes)
+        self._mtime = self.path.stat().st_mtime
+
+
+#
+# Notification sinks, async callables taking an Event
+#
+
+
+class LogSink:
+    async def __call__(self, event):
+        logger.info("[%s] %s %s", event.kind, event.code or "", event.message)
+
+
+class WebhookSink:
+    """POST every event as JSON to a URL"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, event):
+        requests.post(self.url, json=event._asdict(), timeout=self.timeout)
+
+    async def __call__(self, event):
+        loop = get_running_loop()
+        await loop.run_in_executor(None, self._post, event)
+
+
+class CommandSink:
+    """Run a command for every event, with the event in NCHU_EVENT_* variables"""
+
+    def __init__(self, command):
+        self.command = shlex.split(command)
+
+    async def __call__(self, event):
+        env = dict(os.environ)
+        for key, value in event._asdict().items():
+            env[f"NCHU_EVENT_{key.upper()}"] = str(value or "")
+        process = await asyncio.create_subprocess_exec(*self.command, env=env)
+        await process.wait()
+
+
+class Notifier:
+    """Deliver events to every sink, each from a queue of its own
+
+    A slow or failing sink only delays its own notifications, never polling
+    or the other sinks. Events beyond maxsize per sink are dropped.
+    """
+
+    def __init__(self, sinks, maxsize=100):
+        self.sinks = list(sinks)
+        self.queues = [asyncio.Queue(maxsize) for _ in self.sinks]
+        self._workers = []
+
+    def start(self):
+        self._workers = [
+            asyncio.ensure_future(self._deliver(sink, queue))
+            for sink, queue in zip(self.sinks, self.queues)
+        ]
+
+    async def _deliver(self, sink, queue):
+        while True:
+            event = await queue.get()
+            try:
+                await sink(event)
+            except Exception:
+                logger.exception("Sink %r failed on %s", sink, event)
+            finally:
+                queue.task_done()
+
+    def notify(self, event):
+        for sink, queue in zip(self.sinks, self.queues):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Sink %r is behind, dropped %s", sink, event)
+
+    async def close(self, timeout=10):
+        """Wait (up to timeout) for queued events, then stop the workers"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[queue.join() for queue in self.queues]), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Undelivered events dropped on close")
+        for worker in self._workers:
+            worker.cancel()
+
+
+class Monitor:
+    """Poll seats of a watch list with one logged-in student
+
+    >>> monitor = Monitor(student, WatchList("monitoring.json"), "state.json")
+    >>> await monitor.run()
+    """
+
+    def __init__(
+        self,
+        student,
+        watch,
+        state_path,
+        notifier=None,
+        interval=None,
+        add=True,
+    ):
+        self.student = student
+        self.watch = watch
+        self.state_path = Path(state_path)
+        self.notifier = notifier or Notifier([LogSink()])
+        self.interval = interval or AdaptiveInterval()
+        self.add = add
+        self.seats = {}
+        self.added = set()
+        self._stop = asyncio.Event()
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.added = set(state.get("added", []))
+
+    def _save_state(self):
+        write_json(
+            self.state_path,
+            {
+                "updated_at": time(),
+                "interval": self.interval.current(),
+                "watching": self.watching,
+                "added": sorted(self.added),
+                "seats": {
+                    code: {"available": seats.available, "selected": seats.selected}
+                    for code, seats in self.seats.items()
+                },
+            },
+        )
+
+    @property
+    def watching(self):
+        return [code for code in self.watch.codes if code not in self.added]
+
+    def _event(self, kind, code, message):
+        self.notifier.notify(Event(kind, code, message, time()))
+
+    async def poll(self):
+        """Check every watched course once, return whether any seat moved"""
+        if self.watch.reload():
+            logger.info("Watching <%s>", ", ".join(self.watching))
+        codes = self.watching
+        if not codes:
+            return False
+
+        status = await self.student.get_seat_status(codes)
+        changed, vacant = self._observe(status)
+        if vacant and self.add:
+            _, results = await self.student.add_courses(vacant)
+            for result in results:
+                self._report_add(result)
+        return changed
+
+    def _observe(self, status):
+        """Record seats of a poll, return whether any moved and vacant codes"""
+        changed = False
+        vacant = []
+        for code, seats in status.items():
+            last = self.seats.get(code)
+            if last != seats:
+                changed = changed or last is not None
+                self.seats[code] = seats
+            if seats.vacant:
+                vacant.append(code)
+                if last is None or not last.vacant:
+                    self._event("vacant", code, f"{seats.selected}/{seats.available}")
+        return changed, vacant
+
+    def _report_add(self, result):
+        code = result.code
+        # Already selected, e.g. by an earlier add that got no answer
+        held = result.outcome.ok or result.outcome is Outcome.DUPLICATE
+        if not held:
+            self._event("add_failed", code, result.message)
+            if not result.outcome.hopeless:
+                return
+            logger.info("Giving up <%s>, %s", code, result.outcome.value)
+        elif code not in self.added:
+            self.added.add(code)
+            self._event("added", code, result.message)
+        # Done with it, drop it from the watch list as well
+        if code in self.watch.codes:
+            self.watch.save([other for other in self.watch.codes if other != code])
+
+    def stop(self):
+        self._stop.set()
+
+    async def _wait(self, delay):
+        """Sleep until the next poll, cut short by stop() or new watched codes"""
+        deadline = monotonic() + delay
+        while not self._stop.is_set():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._stop.wait(), min(remaining, WATCH_CHECK))
+            except asyncio.TimeoutError:
+                pass
+            if self.watch.reload():
+                logger.info("Watching <%s>", ", ".join(self.watching))
+                return
+
+    async def run(self):
+        self.notifier.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    changed = await self.poll()
+                except Exception as e:
+                    logger.exception("Poll failed")
+                    self._event("error", None, repr(e))
+                    changed = False
+                delay = self.interval.update(changed)
+                self._save_state()
+                logger.debug("Next poll in %.0fs", delay)
+                await self._wait(delay)
+        finally:
+            await self.notifier.close()
+
+
+def _poll_shard(worker, account, commands, results, interval, rate, add):
+    """Worker process polling the codes of one shard with its own session
+
+    Takes the newest shard from commands (None stops it) and puts
+    ``(kind, worker, payload)`` messages on results.
+    """
+    if rate:
+        ratelimit.configure(rate=rate)
+    try:
+        student = Student(*account)
+    except Exception as e:
+        results.put(("error", worker, f"Cannot log in: {e!r}"))
+        sys.exit(CREDENTIALS_EXIT if str(e) == "Incorrect password" else 1)
+    index = CourseIndex("CODE")
+    codes = []
+    delay = None
+    while True:
+        try:
+            codes = commands.get(timeout=delay)
+            if codes is None:
+                return
+        except Empty:
+            pass
+        if not codes:
+            delay = None
+            continue
+
+        start = monotonic()
+        changed = False
+        try:
+            changed = bool(student._check_codes(codes, index))
+            status = {code: index[code].seats for code in codes if code in index}
+            results.put(("seats", worker, (status, monotonic() - start)))
+            vacant = [code for code, seats in status.items() if seats.vacant]
+            if vacant and add:
+                _, added = student.add_courses(vacant)
+                results.put(("adds", worker, added))
+        except Exception as e:
+            results.put(("error", worker, repr(e)))
+        delay = interval.update(changed)
+
+
+def _shard(code, shards):
+    """Shard of a code, the same whatever else is watched"""
+    return zlib.crc32(code.encode()) % shards
+
+
+class ShardedMonitor(Monitor):
+    """Monitor splitting the watch list over worker processes
+
+    Every worker logs in on its own (accounts are handed out round-robin)
+    and polls its shard at its own pace, so a cycle over the whole list takes
+    about 1/workers as long, until the rate limit shared by all of them is
+    reached. Codes are sharded by a hash, so a code stays with its worker
+    when others are added or removed. This process only coordinates: it
+    hands out shards whenever the watch list changes, records seats, sends
+    notifications, and drops added courses from the watch list once, however
+    many workers report them. A worker that dies is reported and started
+    again, up to RESPAWNS times, then its codes go to the workers left. One
+    whose password was refused is not started again.
+
+    >>> monitor = ShardedMonitor(accounts, WatchList("monitoring.json"),
+    ...                          "state.json", workers=8, rate=20)
+    >>> await monitor.run()
+    """
+
+    def __init__(
+        self,
+        accounts,
+        watch,
+        state_path,
+        workers=4,
+        rate=None,
+        notifier=None,
+        interval=None,
+        add=True,
+    ):
+        super().__init__(None, watch, state_path, notifier, interval, add)
+        self.accounts = [tuple(account) for account in accounts]
+        self.workers = workers
+        self.rate = rate
+        self.shards = [None] * workers
+        self.elapsed = {}
+        self.processes = {}
+        self.respawns = [0] * workers
+
+    def _spawn(self, worker):
+        # A new queue, the old one may hold shards the dead worker never read
+        self.commands[worker] = multiprocessing.Queue()
+        self.shards[worker] = None
+        process = multiprocessing.Process(
+            target=_poll_shard,
+            args=(
+                worker,
+                self.accounts[worker % len(self.accounts)],
+                self.commands[worker],
+                self.results,
+                self.interval,
+                self.rate / self.workers if self.rate else None,
+                self.add,
+            ),
+            daemon=True,
+        )
+        process.start()
+        self.processes[worker] = process
+
+    def _assign(self):
+        codes = self.watching
+        alive = sorted(self.processes)
+        if not alive:
+            return
+        for worker in alive:
+            shard = [
+                code for code in codes if alive[_shard(code, len(alive))] == worker
+            ]
+            if shard != self.shards[worker]:
+                self.shards[worker] = shard
+                self.commands[worker].put(shard)
+
+    def _check_workers(self):
+        """Report workers that died, start them again or share out their codes"""
+        dead = [
+            worker
+            for worker, process in self.processes.items()
+            if process.exitcode is not None
+        ]
+        for worker in dead:
+            exitcode = self.processes.pop(worker).exitcode
+            logger.error("Worker %d exited with code %s", worker, exitcode)
+            self._event("error", None, f"Worker {worker} exited with code {exitcode}")
+            if exitcode != CREDENTIALS_EXIT and self.respawns[worker] < RESPAWNS:
+                self.respawns[worker] += 1
+                self._spawn(worker)
+            else:
+                logger.error("Giving up worker %d, its codes go to the others", worker)
+                self.shards[worker] = None
+        if not self.processes:
+            self._event("error", None, "Every worker died, stopping")
+            self.stop()
+        elif dead:
+            self._assign()
+
+    def _receive(self, timeout):
+        try:
+            return self.results.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def _handle(self, message):
+        kind, worker, payload = message
+        if kind == "seats":
+            status, self.elapsed[worker] = payload
+            self._observe(status)
+        elif kind == "adds":
+            for result in payload:
+                self._report_add(result)
+            self._assign()
+        else:
+            logger.error("Worker %d failed: %s", worker, payload)
+            self._event("error", None, payload)
+
+    def _save_state(self):
+        super()._save_state()
+        logger.debug(
+            "Shards of %s codes polled in %s seconds",
+            [len(shard or []) for shard in self.shards],
+            [round(self.elapsed.get(worker, 0), 3) for worker in range(self.workers)],
+        )
+
+    async def run(self):
+        self.watch.reload()
+        self.results = multiprocessing.Queue()
+        self.commands = [None] * self.workers
+        for worker in range(self.workers):
+            self._spawn(worker)
+
+        loop = get_running_loop()
+        self.notifier.start()
+        saved = monotonic()
+        try:
+            self._assign()
+            while not self._stop.is_set():
+                message = await loop.run_in_executor(None, self._receive, 1)
+                if message:
+                    self._handle(message)
+                self._check_workers()
+                if self.watch.reload():
+                    logger.info("Watching <%s>", ", ".join(self.watching))
+                    self._assign()
+                if monotonic() - saved >= 1:
+                    self._save_state()
+                    saved = monotonic()
+        finally:
+            for commands in self.commands:
+                commands.put(None)
+            for process in self.processes.values():
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self._save_state()
+            await self.notifier.close()
+
+
+def _accounts(path):
+    if path:
+        with open(path) as f:
+            return [tuple(account) for account in json.load(f)]
+    username = os.environ.get("NCHU_USERNAME") or input("Username: ")
+    password = os.environ.get("NCHU_PASSWORD") or getpass("Password: ")
+    return [(username, password)]
+
+
+async def _main(args):
+    sinks = [LogSink()]
+    sinks += [WebhookSink(url) for url in args.webhook]
+    sinks += [CommandSink(command) for command in args.command]
+    accounts = _accounts(args.accounts)
+    options = dict(
+        notifier=Notifier(sinks),
+        interval=AdaptiveInterval(args.interval, args.min_interval, args.max_interval),
+        add=not args.no_add,
+    )
+    if args.workers > 1:
+        monitor = ShardedMonitor(
+            accounts,
+            WatchList(args.watch),
+            args.state,
+            workers=args.workers,
+            rate=args.rate,
+            **options,
+        )
+        await monitor.run()
+        return
+
+    if args.rate:
+        ratelimit.configure(rate=args.rate)
+    async with Pool(max_connections=2) as pool:
+        student = await AsyncStudent.login(
+            *accounts[0], pool=pool, session_store=SessionStore()
+        )
+        monitor = Monitor(student, WatchList(args.watch), args.state, **options)
+        await monitor.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="Credentials are read from --accounts, a JSON list of "
+        "[username, password], or from NCHU_USERNAME and NCHU_PASSWORD, "
+        "or prompted for.",
+    )
+    parser.add_argument("--watch", default="monitoring.json")
+    parser.add_argument("--state", default="monitor_state.json")
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--min-interval", type=float, default=10)
+    parser.add_argument("--max-interval", type=float, default=600)
+    parser.add_argument(
+        "--no-add", action="store_true", help="only notify about vacant seats"
+    )
+    parser.add_argument("--webhook", action="append", default=[], metavar="URL")
+    parser.add_argument(
+        "--command",
+        action="append",
+        default=[],
+        help="run for every event, with NCHU_EVENT_* set",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="split the watch list over this many processes",
+    )
+    parser.add_argument("--accounts", metavar="PATH")
+    parser.add_argument(
+        "--rate", type=float, help="requests per second to ACAD, of all workers"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
+    )
+    if hasattr(asyncio, "run"):
+        try:
+            asyncio.run(_main(args))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Python 3.6
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    task = loop.create_task(_main(args))
+    try:
+        loop.run_until_complete(task)
+    except KeyboardInterrupt:
+        task.cancel()
+        loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
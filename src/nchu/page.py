@@ -0,0 +1,268 @@
+"""Parsed HTML pages of NCHU Portal System
+
+Pages are parsed by one of the pluggable backends below. ``lxml`` builds a
+plain ``lxml.html`` tree and is used on every hot scraping path by default;
+``bs4`` (BeautifulSoup) is kept as the fallback and yields identical output.
+"""
+import re
+
+_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+# Characters fed at once to incremental parsers
+STREAM_CHUNK = 16384
+
+
+def collapse(string):
+    """Collapse whitespace the same way as pandas.read_html"""
+    return _WHITESPACE.sub(" ", string).strip()
+
+
+class Page:
+    """HTML response parsed once, with its forms, tables, rows and inputs
+    indexed on first access
+
+    Subclasses implement the parsing primitives (``_parse``, ``find_all``,
+    ``attr`` and ``strings``) for one backend, everything else is shared.
+    """
+
+    def __init__(self, html, url=None):
+        self.html = html
+        self.url = url
+        self._root = None
+        self._forms = None
+        self._tables = None
+        self._inputs = None
+        self._rows = {}
+        self._cells = {}
+        self._hiddens = {}
+
+    @classmethod
+    def from_response(cls, response):
+        return cls._backend()(response.text, response.url)
+
+    @classmethod
+    def of(cls, page):
+        """Accept either a Page or raw HTML"""
+        return page if isinstance(page, Page) else cls._backend()(page)
+
+    @classmethod
+    def _backend(cls):
+        return backend() if cls is Page else cls
+
+    #
+    # Backend primitives
+    #
+
+    def _parse(self):
+        raise NotImplementedError
+
+    def find_all(self, element, tag):
+        """All descendants of element with given tag, in document order"""
+        raise NotImplementedError
+
+    def attr(self, element, name, default=None):
+        raise NotImplementedError
+
+    def strings(self, element):
+        raise NotImplementedError
+
+    #
+    # Shared indexes
+    #
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = self._parse()
+        return self._root
+
+    def find(self, element, tag):
+        found = self.find_all(element, tag)
+        return found[0] if found else None
+
+    def text(self, element):
+        return collapse("".join(self.strings(element)))
+
+    @property
+    def forms(self):
+        if self._forms is None:
+            self._forms = self.find_all(self.root, "form")
+        return self._forms
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = self.find_all(self.root, "table")
+        return self._tables
+
+    @property
+    def inputs(self):
+        """Value of every named input in the page, first occurrence wins"""
+        if self._inputs is None:
+            self._inputs = {}
+            for field in self.find_all(self.root, "input"):
+                name = self.attr(field, "name")
+                if name is not None:
+                    self._inputs.setdefault(name, self.attr(field, "value", ""))
+        return self._inputs
+
+    def _element(self, table, form):
+        if table is not None:
+            return ("table", table), self.tables[table]
+        return ("form", form), self.forms[form]
+
+    def rows(self, table=None, form=None):
+        """All <tr> within the table or form of given index"""
+        key, element = self._element(table, form)
+        if key not in self._rows:
+            self._rows[key] = self.find_all(element, "tr")
+        return self._rows[key]
+
+    def cells(self, table=None, form=None):
+        """All <td> within the table or form of given index"""
+        key, element = self._element(table, form)
+        if key not in self._cells:
+            self._cells[key] = self.find_all(element, "td")
+        return self._cells[key]
+
+    def iter_rows(self, tables):
+        """(<table>, <tr>) of every row within the tables of given indexes
+
+        Backends able to parse incrementally yield rows while the page is
+        still being parsed. A row is then only valid until the next one, and
+        its table only holds what precedes the row (e.g. its header).
+        """
+        tables = set(tables)
+        for index, table in enumerate(self.tables):
+            if index in tables:
+                for row in self.find_all(table, "tr"):
+                    yield table, row
+
+    def header(self, table):
+        return [
+            "".join(self.strings(tag))
+            for tag in self.find_all(self.tables[table], "th")
+        ]
+
+    def _typed_inputs(self, element, input_type):
+        return [
+            field
+            for field in self.find_all(element, "input")
+            if (self.attr(field, "type") or "").lower() == input_type
+        ]
+
+    def hidden_inputs(self, form=0):
+        """Hidden inputs of a form, given by index or as an element"""
+        if not isinstance(form, int):
+            return {
+                self.attr(field, "name"): self.attr(field, "value", "")
+                for field in self._typed_inputs(form, "hidden")
+            }
+        if form not in self._hiddens:
+            self._hiddens[form] = self.hidden_inputs(self.forms[form])
+        return self._hiddens[form]
+
+    def input_names(self, input_type, form=0):
+        names = [
+            self.attr(field, "name")
+            for field in self._typed_inputs(self.forms[form], input_type)
+        ]
+        return list(dict.fromkeys(names))
+
+
+class LxmlPage(Page):
+    def _parse(self):
+        import lxml.html
+
+        if not self.html.strip():
+            return lxml.html.Element("html")
+        return lxml.html.document_fromstring(self.html)
+
+    def iter_rows(self, tables):
+        if self._root is not None:
+            yield from super().iter_rows(tables)
+            return
+        import lxml.html
+        from lxml import etree
+
+        tables = set(tables)
+        parser = etree.HTMLPullParser(events=("start", "end"), tag=("table", "tr"))
+        parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        # Wanted tables currently open, depth of rows open and tables seen
+        opened, depth, count = [], 0, 0
+        for start in range(0, len(self.html), STREAM_CHUNK):
+            parser.feed(self.html[start : start + STREAM_CHUNK])
+            for event, element in parser.read_events():
+                if element.tag == "table":
+                    if event == "start":
+                        if count in tables:
+                            opened.append(element)
+                        count += 1
+                    elif opened and opened[-1] is element:
+                        opened.pop()
+                    continue
+                depth += 1 if event == "start" else -1
+                if event == "start" or depth:
+                    continue
+                if opened:
+                    yield opened[-1], element
+                # Drop parsed rows, so the tree never holds more than one
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+        if self.html.strip():
+            parser.close()
+
+    def find_all(self, element, tag):
+        return list(element.iterdescendants(tag))
+
+    def attr(self, element, name, default=None):
+        return element.get(name, default)
+
+    def strings(self, element):
+        return [element.text_content()]
+
+
+class SoupPage(Page):
+    def _parse(self):
+        import bs4
+
+        features = "lxml" if _has_lxml() else "html.parser"
+        return bs4.BeautifulSoup(self.html, features=features)
+
+    def find_all(self, element, tag):
+        return element.find_all(tag)
+
+    def attr(self, element, name, default=None):
+        return element.get(name, default)
+
+    def strings(self, element):
+        return element.strings
+
+
+BACKENDS = {
+    "lxml": LxmlPage,
+    "bs4": SoupPage,
+}
+_active = None
+
+
+def _has_lxml():
+    try:
+        import lxml.html  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def backend():
+    """Page class of the active parser backend"""
+    global _active
+    if _active is None:
+        _active = LxmlPage if _has_lxml() else SoupPage
+    return _active
+
+
+def set_backend(name):
+    """Switch parser backend, either ``"lxml"`` or ``"bs4"``"""
+    global _active
+    _active = BACKENDS[name]
@@ -0,0 +1,237 @@
+"""Add courses at the exact moment course registration opens"""
+import logging
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from typing import List, NamedTuple, Optional
+
+import requests
+
+from . import (
+    DIRECT_BATCH_SIZE,
+    FINAL_ENDPOINTS,
+    CourseResult,
+    FunctionClosedError,
+    Outcome,
+    SessionExpiredError,
+    _chunks,
+    _outcome,
+    _with_not_found,
+)
+from .course import CourseIndex
+from .page import Page
+
+logger = logging.getLogger(__name__)
+
+# Sleep until this many seconds before the deadline, then spin on the clock
+SPIN = 0.02
+
+
+class ClockOffset(NamedTuple):
+    # Seconds to add to the local clock to get the server clock
+    offset: float
+    # Half width of the range the offset is known to lie in
+    error: float
+    # Fastest round trip seen while sampling
+    rtt: float
+
+
+class Landing(NamedTuple):
+    endpoint: str
+    attempt: int
+    status: Optional[int]
+    outcome: str
+    # Estimated arrival at the server minus the target time, in seconds
+    offset: float
+    elapsed: float
+
+
+class FireReport(NamedTuple):
+    results: List[CourseResult]
+    landings: List[Landing]
+    clock: ClockOffset
+
+    @property
+    def messages(self):
+        return [result.message for result in self.results]
+
+
+def estimate_clock_offset(student, samples=8):
+    """Offset of the ACAD server clock from the local one, via Date headers
+
+    Date only has a resolution of one second, so samples are spread over a
+    second and the ranges they allow are intersected. Each response was
+    dated somewhere between sending and receiving it.
+    """
+    low, high, rtt = float("-inf"), float("inf"), float("inf")
+    for sample in range(samples):
+        sent = time()
+        response = student._send("GET", "sidebar")
+        received = time()
+        date = parsedate_to_datetime(response.headers["Date"]).timestamp()
+        low = max(low, date - received)
+        high = min(high, date + 1 - sent)
+        rtt = min(rtt, received - sent)
+        sleep(1 / samples)
+    if low > high:
+        # Server clock jumped while sampling, settle for the middle
+        low, high = high, low
+    return ClockOffset((low + high) / 2, (high - low) / 2, rtt)
+
+
+class PreArmedAdd:
+    """Direct add of courses, prepared in advance and fired on time
+
+    Arming logs in, measures the clock offset to the server and prepares the
+    form of every request. Firing keeps the session and connection warm
+    until the deadline, then sends the add so it lands at the server at the
+    target time, retrying every ``spacing`` seconds while it is still closed.
+    Codes the check does not find are left out of the add and reported as
+    NOT_FOUND, as by Student.add_courses.
+
+    >>> armed = PreArmedAdd(student, ["0349", "1161"])
+    >>> armed.arm()
+    >>> report = armed.fire_at(datetime(2021, 2, 22, 12, 30).timestamp())
+    >>> [landing.offset for landing in report.landings]
+    """
+
+    def __init__(self, student, course_codes, attempts=40, spacing=0.05):
+        self.student = student
+        self.course_codes = list(course_codes)
+        self.attempts = attempts
+        self.spacing = spacing
+        self.clock = None
+        self.index = CourseIndex("CODE")
+        self.checks = []
+        self.finals = []
+        self._landings = []
+
+    def arm(self):
+        """Login, estimate the clock offset and prepare the requests"""
+        student = self.student
+        student.login_acad()
+        self.clock = estimate_clock_offset(student)
+        logger.info("Server clock offset %+.3fs (±%.3fs), rtt %.3fs", *self.clock)
+
+        batches = list(_chunks(self.course_codes, DIRECT_BATCH_SIZE))
+        self.checks = [[("V_WANT", code) for code in batch] for batch in batches]
+        self.finals = []
+        # Secrets may already be listed before registration opens
+        if _outcome(student._send("GET", "direct_list")) == "ok":
+            for batch, check in zip(batches, self.checks):
+                response = student._send("POST", "direct_check", data=check)
+                if _outcome(response) != "ok":
+                    break
+                self.index.update(Page.from_response(response))
+                self.finals.append(self._final_data(batch))
+            else:
+                logger.info("Secrets prepared, only final requests are left")
+                return self
+        self.finals = []
+        logger.info("Secrets not available yet, check requests will be sent")
+        return self
+
+    def _final_data(self, batch):
+        """Codes of a batch found in the index and the form of their final"""
+        found = [code for code in batch if code in self.index]
+        unknown = [code for code in batch if code not in self.index]
+        if unknown:
+            logger.warning("<%s> cannot be found, not adding", ", ".join(unknown))
+        if not found:
+            return found, None
+        return found, self.student._direct_final_data(found, self.index)
+
+    def _fire(self, method, endpoint, data=None):
+        """Send a prepared request, again while the function is closed
+
+        Requests other than finals are sent again on server errors as well,
+        finals are returned as they are, as they may have been carried out.
+        """
+        retried = {"closed"}
+        if endpoint not in FINAL_ENDPOINTS:
+            retried.add("server_error")
+        for attempt in range(self.attempts):
+            response = self.student._send(method, endpoint, attempt, data=data)
+            outcome = _outcome(response)
+            if outcome == "expired":
+                raise SessionExpiredError(f"Session expired on <{endpoint}>")
+            if outcome not in retried:
+                return response
+            sleep(self.spacing)
+        if outcome == "server_error":
+            raise requests.HTTPError(
+                f"{response.status_code} on <{endpoint}>", response=response
+            )
+        raise FunctionClosedError(f"<{endpoint}> still closed after firing")
+
+    def _fire_final(self, batch, found, final):
+        """CourseResult of every code of a batch, NOT_FOUND unless in found"""
+        if not found:
+            return _with_not_found(batch, [])
+        response = self._fire("POST", "direct_final", final)
+        if response.status_code != 200:
+            message = (
+                f"{response.status_code} on <direct_final>, "
+                "it may have been carried out"
+            )
+            results = [CourseResult(code, Outcome.UNKNOWN, message) for code in found]
+        else:
+            results = self.student._direct_results(found, response)
+        return _with_not_found(batch, results)
+
+    def _record(self, event):
+        self._landings.append((time(), event))
+
+    def _wait(self, deadline, keepalive, warmup):
+        """Sleep until a monotonic deadline, keeping ACAD warm on the way"""
+        while deadline - monotonic() > warmup + keepalive:
+            sleep(keepalive)
+            self.student._send("GET", "sidebar")
+
+        # Fresh keep-alive connection right before firing
+        sleep(max(0, deadline - monotonic() - warmup))
+        self.student._send("GET", "sidebar")
+        sleep(max(0, deadline - monotonic() - SPIN))
+        while monotonic() < deadline:
+            pass
+
+    def fire_at(self, target, keepalive=60, warmup=1.0):
+        """Fire at a Unix timestamp of the server clock, return a FireReport"""
+        if self.clock is None:
+            self.arm()
+        # Leave half a round trip early, so requests arrive on time
+        local_target = target - self.clock.offset - self.clock.rtt / 2
+        deadline = monotonic() + (local_target - time())
+        self._wait(deadline, keepalive, warmup)
+
+        self._landings = []
+        self.student.hooks.append(self._record)
+        try:
+            results = []
+            batches = _chunks(self.course_codes, DIRECT_BATCH_SIZE)
+            if self.finals:
+                for batch, (found, final) in zip(batches, self.finals):
+                    results += self._fire_final(batch, found, final)
+            else:
+                self._fire("GET", "direct_list")
+                for batch, check in zip(batches, self.checks):
+                    response = self._fire("POST", "direct_check", check)
+                    self.index.update(Page.from_response(response))
+                    results += self._fire_final(batch, *self._final_data(batch))
+        finally:
+            self.student.hooks.remove(self._record)
+
+        landings = []
+        for received, event in self._landings:
+            # Arrival estimated as half way through the round trip
+            arrived = received + self.clock.offset - event.elapsed / 2
+            landings.append(
+                Landing(
+                    endpoint=event.endpoint,
+                    attempt=event.attempt,
+                    status=event.status,
+                    outcome=event.outcome,
+                    offset=arrived - target,
+                    elapsed=event.elapsed,
+                )
+            )
+        return FireReport(results, landings, self.clock)
@@ -0,0 +1,82 @@
+"""Client-side rate limiting of requests to ACAD"""
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average, ``burst`` at once
+
+    Thread-safe, so one bucket can be shared by every Student in a process.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request is allowed"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            sleep(wait)
+
+
+class RateLimiter:
+    """Token buckets toward ACAD plus a cap on requests in flight
+
+    ``rate``/``burst`` apply to every request, ``endpoints`` maps ACAD_MAP
+    keys (e.g. ``"direct_check"``) to an extra ``(rate, burst)`` of their own,
+    and ``max_in_flight`` caps concurrent requests. Without any of them the
+    limiter lets everything through at no cost.
+    """
+
+    def __init__(self, rate=None, burst=1, endpoints=None, max_in_flight=None):
+        self.configure(rate, burst, endpoints, max_in_flight)
+
+    def configure(self, rate=None, burst=1, endpoints=None, max_in_flight=None):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.endpoints = {
+            key: TokenBucket(*spec) for key, spec in (endpoints or {}).items()
+        }
+        self.max_in_flight = max_in_flight
+        self._in_flight = threading.BoundedSemaphore(max_in_flight or 1)
+
+    @contextmanager
+    def limit(self, endpoint=None):
+        """Wait for the rate limits of an endpoint and hold an in-flight slot"""
+        if self.bucket:
+            self.bucket.acquire()
+        if endpoint in self.endpoints:
+            self.endpoints[endpoint].acquire()
+        if not self.max_in_flight:
+            yield
+            return
+        with self._in_flight:
+            yield
+
+
+# Shared by every Student created without a rate_limiter of its own
+shared = RateLimiter()
+
+
+def configure(rate=None, burst=1, endpoints=None, max_in_flight=None):
+    """Set the limits shared by every Student in this process
+
+    >>> nchu.ratelimit.configure(
+    ...     rate=5, burst=5, endpoints={"direct_check": (1, 2)}, max_in_flight=4
+    ... )
+    """
+    shared.configure(rate, burst, endpoints, max_in_flight)
@@ -0,0 +1,210 @@
+"""Run jobs for many accounts over one worker pool"""
+import heapq
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import count
+from time import monotonic
+from typing import Any, NamedTuple, Optional
+
+from . import FillingPolicy, Student
+from .ratelimit import RateLimiter
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+class Account(NamedTuple):
+    username: str
+    password: str
+
+
+class JobResult(NamedTuple):
+    username: str
+    job: Any
+    result: Any
+    error: Optional[BaseException]
+    elapsed: float
+
+
+class WatchJob:
+    """Check a list of course codes every interval seconds
+
+    With ``add=True`` the codes are added through the direct add flow,
+    otherwise only their seats are polled. Codes that can never be added
+    (e.g. conflicting or already selected) are not tried again.
+    """
+
+    repeat = True
+
+    def __init__(self, course_codes, interval=60, add=True):
+        self.course_codes = list(course_codes)
+        self.interval = interval
+        self.add = add
+        self.hopeless = set()
+
+    def __call__(self, student):
+        if self.add:
+            codes = [code for code in self.course_codes if code not in self.hopeless]
+            _, results = student.add_courses(codes)
+            self.hopeless.update(r.code for r in results if r.outcome.hopeless)
+            return {result.code: result for result in results}
+        return student.get_seat_status(self.course_codes)
+
+    def __repr__(self):
+        return f"<WatchJob {', '.join(self.course_codes)}>"
+
+
+class QuestionnaireJob:
+    """Fill every pending questionnaire and TA questionnaire once"""
+
+    repeat = False
+    interval = 0
+
+    def __init__(self, policy=FillingPolicy.GREAT):
+        self.policy = policy
+
+    def __call__(self, student):
+        report = student.fill_all_questionnaires(self.policy)
+        return report + student.fill_all_ta_questionnaires(self.policy)
+
+    def __repr__(self):
+        return "<QuestionnaireJob>"
+
+
+class Scheduler:
+    """Round-robin jobs of many accounts over a thread pool
+
+    Each account runs at most one job at a time on its own logged-in Student,
+    which is kept for the whole run. Accounts take turns in a fixed order, so
+    a busy account never starves the others, and every request of every
+    account shares one rate limit and connection pool toward ACAD.
+
+    >>> scheduler = Scheduler(accounts, max_workers=4, rate=5)
+    >>> scheduler.add_job("4107056000", WatchJob(["0349", "1159"], interval=30))
+    >>> scheduler.add_job("4107056001", QuestionnaireJob())
+    >>> scheduler.run(timeout=3600)
+    """
+
+    def __init__(
+        self,
+        accounts,
+        max_workers=4,
+        rate=None,
+        session_store=None,
+        on_result=None,
+        hooks=None,
+        transport=None,
+    ):
+        accounts = [Account(*account) for account in accounts]
+        self.accounts = {account.username: account for account in accounts}
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate, burst=max_workers) if rate else None
+        self.transport = transport or Transport(
+            pool_maxsize=max_workers, pool_block=True
+        )
+        self.adapter = self.transport.adapter()
+        self.session_store = session_store
+        self.hooks = hooks
+        self.results = []
+        self.on_result = on_result or self.results.append
+        self.students = {}
+        self._queues = {username: [] for username in self.accounts}
+        self._ready = deque(self.accounts)
+        self._order = count()
+        self._stop = threading.Event()
+
+    def add_job(self, username, job, delay=0):
+        heapq.heappush(
+            self._queues[username], (monotonic() + delay, next(self._order), job)
+        )
+
+    def stop(self):
+        self._stop.set()
+
+    def student(self, username):
+        if username not in self.students:
+            account = self.accounts[username]
+            self.students[username] = Student(
+                account.username,
+                account.password,
+                adapter=self.adapter,
+                session_store=self.session_store,
+                rate_limiter=self.rate_limiter,
+                hooks=self.hooks,
+                transport=self.transport,
+            )
+        return self.students[username]
+
+    def _run_job(self, username, job):
+        start = monotonic()
+        try:
+            result, error = job(self.student(username)), None
+        except Exception as exc:
+            logger.exception("%s of <%s> failed", job, username)
+            result, error = None, exc
+        return JobResult(username, job, result, error, monotonic() - start)
+
+    def _next_due(self, username, now):
+        queue = self._queues[username]
+        if queue and queue[0][0] <= now:
+            return heapq.heappop(queue)[2]
+        return None
+
+    def _next_wakeup(self, now):
+        """Seconds until a job of an idle account is due, None if none is"""
+        dues = [
+            self._queues[username][0][0]
+            for username in self._ready
+            if self._queues[username]
+        ]
+        return max(0, min(dues) - now) if dues else None
+
+    def run(self, timeout=None):
+        """Run until every job is done, stop() is called or timeout passes"""
+        deadline = monotonic() + timeout if timeout is not None else None
+        running = {}
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while not self._stop.is_set():
+                now = monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+
+                # Give each idle account a turn, in round-robin order
+                for _ in range(len(self._ready)):
+                    if len(running) >= self.max_workers:
+                        break
+                    username = self._ready.popleft()
+                    job = self._next_due(username, now)
+                    if job is None:
+                        self._ready.append(username)
+                        continue
+                    future = executor.submit(self._run_job, username, job)
+                    running[future] = username
+
+                wakeup = self._next_wakeup(now)
+                if not running and wakeup is None:
+                    break
+                if len(running) >= self.max_workers:
+                    # Nothing can start before a running job is done
+                    wakeup = None
+                if deadline is not None:
+                    remain = deadline - now
+                    wakeup = remain if wakeup is None else min(wakeup, remain)
+                if not running:
+                    self._stop.wait(wakeup)
+                    continue
+                done, _ = wait(running, timeout=wakeup, return_when=FIRST_COMPLETED)
+                for future in done:
+                    username = running.pop(future)
+                    result = future.result()
+                    if result.job.repeat:
+                        self.add_job(username, result.job, delay=result.job.interval)
+                    self._ready.append(username)
+                    self.on_result(result)
+
+        # Jobs still running at the deadline were waited for on exit
+        for future in running:
+            self.on_result(future.result())
+        return self.results
@@ -0,0 +1,64 @@
+"""On-disk store of logged-in sessions, keyed by username"""
+import json
+import os
+from pathlib import Path
+from time import time
+
+DEFAULT_DIRECTORY = Path.home() / ".nchu" / "sessions"
+
+
+class SessionStore:
+    """Save cookies and login time so a new Student can skip logging in
+
+    Files are only readable by the current user, as the cookies grant the
+    same access as the password does until they expire.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_age=None):
+        self.directory = Path(directory)
+        self.max_age = max_age
+
+    def path(self, username):
+        return self.directory / f"{username}.json"
+
+    def load(self, username):
+        """Saved cookies of a user, or None if missing or older than max_age"""
+        try:
+            with open(self.path(username)) as f:
+                record = json.load(f)
+            logined_at, cookies = record["logined_at"], record["cookies"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if self.max_age is not None and time() - logined_at > self.max_age:
+            return None
+        return cookies
+
+    def save(self, username, cookies):
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        record = {
+            "username": username,
+            "logined_at": time(),
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "secure": cookie.secure,
+                    "expires": cookie.expires,
+                }
+                for cookie in cookies
+            ],
+        }
+        path = self.path(username)
+        temp = path.with_suffix(".tmp")
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(temp, path)
+
+    def delete(self, username):
+        try:
+            self.path(username).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,293 @@
+"""HTTP transport settings of Student: timeouts, pooling, retries, HTTP/2"""
+import os
+import socket
+import ssl
+import threading
+from http.client import HTTPMessage
+from io import BufferedReader, BytesIO, RawIOBase
+
+from requests import exceptions
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, select_proxy
+from urllib3.response import HTTPResponse
+from urllib3.util.retry import Retry
+
+# Headers describing the body as sent, not as handed over once decoded
+_ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+# Headers of one HTTP/1.1 connection, not allowed in HTTP/2
+_CONNECTION_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade"}
+# Seconds idle before the first keep-alive probe, seconds between probes, and
+# unanswered probes before the connection is dropped
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 3
+
+
+def _keepalive_options():
+    """Socket options probing idle connections, as far as the platform allows
+
+    SO_KEEPALIVE alone waits for the system default (two hours on Linux)
+    before probing, so the timings are set as well where they are supported.
+    """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # TCP_KEEPIDLE on Linux and Windows, TCP_KEEPALIVE on macOS
+    idle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+    for option, value in (
+        (idle, KEEPALIVE_IDLE),
+        (getattr(socket, "TCP_KEEPINTVL", None), KEEPALIVE_INTERVAL),
+        (getattr(socket, "TCP_KEEPCNT", None), KEEPALIVE_COUNT),
+    ):
+        if option is not None:
+            options.append((socket.IPPROTO_TCP, option, value))
+    return options
+
+
+def _has_brotli():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class TunedAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive probes on its sockets
+
+    Idle keep-alive connections dropped by a NAT or firewall are then noticed
+    within about KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT
+    seconds, instead of hanging the next request until the read timeout.
+    Where the platform does not let the probe timings be set, the system
+    default applies (two hours on Linux).
+    """
+
+    def __init__(self, *args, keepalive=True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive:
+            kwargs["socket_options"] = [
+                (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                *_keepalive_options(),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class _Original:
+    # What requests reads cookies from, in place of http.client.HTTPResponse
+    def __init__(self, msg):
+        self.msg = msg
+
+    def isclosed(self):
+        return True
+
+
+class _Body(RawIOBase):
+    # File object over a streamed httpx response, for urllib3 to read from
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, b"")
+            if not self.pending:
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def close(self):
+        self.response.close()
+        super().close()
+
+
+def _requests_error(error, request):
+    """requests exception matching an httpx one, for retries to tell apart"""
+    import httpx
+
+    for httpx_type, requests_type in (
+        (httpx.ConnectTimeout, exceptions.ConnectTimeout),
+        (httpx.TimeoutException, exceptions.ReadTimeout),
+        (httpx.ProxyError, exceptions.ProxyError),
+    ):
+        if isinstance(error, httpx_type):
+            return requests_type(error, request=request)
+    return exceptions.ConnectionError(error, request=request)
+
+
+def _ssl_context(verify, cert):
+    """SSLContext checking certificates the way requests would"""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        bundle = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(bundle):
+            context = ssl.create_default_context(capath=bundle)
+        else:
+            context = ssl.create_default_context(cafile=bundle)
+    if isinstance(cert, tuple):
+        context.load_cert_chain(*cert)
+    elif cert:
+        context.load_cert_chain(cert)
+    return context
+
+
+class HTTP2Adapter(HTTPAdapter):
+    """Send requests through httpx clients, multiplexed over HTTP/2
+
+    Responses are handed back as regular requests responses, so cookies,
+    redirects and hooks of the session work as usual. ``verify``, ``cert``
+    and proxies of the session are honored, with a client for every
+    combination of them in use. Extra kwargs (e.g. ``local_address``) go to
+    ``httpx.HTTPTransport``. Needs the ``http2`` extra (``httpx[http2]``).
+    """
+
+    def __init__(self, max_connections=10, retries=0, **kwargs):
+        super().__init__(max_retries=retries)
+        self.max_connections = max_connections
+        self.retries = retries
+        self.options = kwargs
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, verify=True, cert=None, proxy=None):
+        """httpx client for these settings, created on first use"""
+        import httpx
+
+        key = (verify, cert, proxy)
+        with self._lock:
+            if key not in self.clients:
+                self.clients[key] = httpx.Client(
+                    follow_redirects=False,
+                    transport=httpx.HTTPTransport(
+                        http2=True,
+                        verify=_ssl_context(verify, cert),
+                        proxy=httpx.Proxy(proxy) if proxy else None,
+                        retries=self.retries,
+                        limits=httpx.Limits(max_connections=self.max_connections),
+                        **self.options,
+                    ),
+                )
+            return self.clients[key]
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        import httpx
+
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        client = self.client(verify, cert, select_proxy(request.url, proxies or {}))
+        headers = {
+            name: value
+            for name, value in request.headers.items()
+            if name.lower() not in _CONNECTION_HEADERS
+        }
+        try:
+            response = client.send(
+                client.build_request(
+                    request.method,
+                    request.url,
+                    headers=headers,
+                    content=request.body,
+                    timeout=timeout,
+                ),
+                stream=stream,
+            )
+        except httpx.TransportError as error:
+            raise _requests_error(error, request) from error
+        # httpx already decoded the body, drop headers describing the encoding
+        msg = HTTPMessage()
+        for name, value in response.headers.multi_items():
+            if name.lower() not in _ENCODING_HEADERS:
+                msg[name] = value
+        raw = HTTPResponse(
+            body=(
+                BufferedReader(_Body(response)) if stream else BytesIO(response.content)
+            ),
+            headers=list(msg.items()),
+            status=response.status_code,
+            reason=response.reason_phrase,
+            preload_content=False,
+            decode_content=False,
+            original_response=_Original(msg),
+        )
+        return self.build_response(request, raw)
+
+    def close(self):
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+        super().close()
+
+
+class Transport:
+    """How a Student talks HTTP
+
+    ``timeout`` is ``(connect, read)`` seconds for every request,
+    ``pool_maxsize`` the connections kept per host, ``retries`` how many
+    times a failed connect is retried by the adapter itself (every other
+    error is left to Student.retry). ``compression`` asks for gzip, deflate
+    and, if brotli is installed, br; disable it to save CPU on a fast link.
+    ``http2`` sends everything through :class:`HTTP2Adapter`.
+
+    >>> Student(username, password, transport=Transport(timeout=(3, 10)))
+    """
+
+    def __init__(
+        self,
+        timeout=(5, 30),
+        pool_connections=2,
+        pool_maxsize=10,
+        pool_block=False,
+        retries=1,
+        keepalive=True,
+        compression=True,
+        http2=False,
+    ):
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.retries = retries
+        self.keepalive = keepalive
+        self.compression = compression
+        self.http2 = http2
+
+    @property
+    def accept_encoding(self):
+        if not self.compression:
+            return "identity"
+        return "gzip, deflate, br" if _has_brotli() else "gzip, deflate"
+
+    def adapter(self):
+        if self.http2:
+            return HTTP2Adapter(max_connections=self.pool_maxsize, retries=self.retries)
+        return TunedAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=Retry(
+                total=self.retries, connect=self.retries, read=False, status=0
+            ),
+            keepalive=self.keepalive,
+        )
+
+    def mount(self, session, adapter=None):
+        """Configure a session, with a shared adapter if one is given"""
+        adapter = adapter or self.adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept-Encoding"] = self.accept_encoding
+        return adapter
@@ -0,0 +1,69 @@
+"""Pages of the recorded fixtures and the mock server serving them"""
+from types import SimpleNamespace
+
+import pytest
+from mock_server import PASSWORD, USERNAME, Handler, MockServer, State
+
+import nchu
+from nchu.page import BACKENDS
+
+
+@pytest.fixture
+def state():
+    return State()
+
+
+@pytest.fixture
+def render(state):
+    """HTML of a mock server page, by handler (e.g. ``enro_direct2_chk``) or
+    fixture name, with form fields given as keyword arguments"""
+    handler = Handler.__new__(Handler)
+    handler.server = SimpleNamespace(state=state)
+    handler.headers = {"Host": "acad.test"}
+
+    def render(name, **form):
+        page = getattr(handler, f"page_{name}", None)
+        if page is None:
+            return handler._render(name)
+        return page(
+            {
+                key: [value] if isinstance(value, str) else list(value)
+                for key, value in form.items()
+            }
+        )
+
+    return render
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    return BACKENDS[request.param]
+
+
+@pytest.fixture
+def page(render, backend):
+    """Page of a mock server page, parsed by every backend in turn"""
+
+    def page(name, **form):
+        return backend(render(name, **form), url="http://acad.test/cofsys/plsql/")
+
+    return page
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Mock Portal and ACAD, served on a free port for the test"""
+    with MockServer() as server:
+        monkeypatch.setattr(nchu, "PORTAL_BASE", server.portal_url)
+        monkeypatch.setattr(nchu, "ACAD_BASE", server.url)
+        yield server
+
+
+@pytest.fixture
+def account():
+    return USERNAME, PASSWORD
+
+
+@pytest.fixture
+def student(server, account):
+    return nchu.Student(*account)
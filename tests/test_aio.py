@@ -0,0 +1,35 @@
+import asyncio
+
+from nchu import Outcome
+from nchu.aio import AsyncStudent, Pool
+
+
+def test_students_share_the_pool(server, account):
+    async def main():
+        async with Pool(max_connections=2) as pool:
+            students = await asyncio.gather(*[pool.student(*account) for _ in range(3)])
+            assert all(student.pool is pool for student in students)
+            assert {s.student.session.get_adapter(server.url) for s in students} == {
+                pool.adapter
+            }
+            return await asyncio.gather(
+                *[student.get_seat_status(["0349", "1159"]) for student in students]
+            )
+
+    for status in asyncio.run(main()):
+        assert status["0349"].vacant
+        assert not status["1159"].vacant
+
+
+def test_add_and_drop(server, account):
+    async def main():
+        async with Pool() as pool:
+            student = await AsyncStudent.login(*account, pool=pool)
+            _, results = await student.add_courses(["0501", "1159"])
+            dropped = await student.remove_course("0501")
+            return results, dropped
+
+    results, dropped = asyncio.run(main())
+    assert [result.outcome for result in results] == [Outcome.ADDED, Outcome.FULL]
+    assert dropped == "退選成功"
+    assert "0501" not in server.state.enrolled
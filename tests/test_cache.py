@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+from nchu.cache import ResponseCache
+
+
+def response(content, status_code=200, **headers):
+    return SimpleNamespace(content=content, status_code=status_code, headers=headers)
+
+
+@pytest.fixture
+def parses():
+    parses = []
+
+    def parse(response):
+        parses.append(response.content)
+        return response.content.decode()
+
+    parse.calls = parses
+    return parse
+
+
+def test_same_body_is_not_parsed_again(parses):
+    cache = ResponseCache()
+    key = cache.key("POST", "direct_check", {"V_WANT": "0349"})
+    assert cache.resolve(key, response(b"a"), parses) == "a"
+    assert cache.resolve(key, response(b"a"), parses) == "a"
+    assert cache.resolve(key, response(b"b"), parses) == "b"
+    assert parses.calls == [b"a", b"b"]
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.hit_rate == pytest.approx(1 / 3)
+
+
+def test_keys_of_dict_and_pairs_match():
+    assert ResponseCache.key("POST", "x", {"a": "1"}) == ResponseCache.key(
+        "POST", "x", [("a", "1")]
+    )
+    assert ResponseCache.key("GET", "x") != ResponseCache.key("GET", "y")
+
+
+def test_validators_and_not_modified(parses):
+    cache = ResponseCache()
+    key = cache.key("GET", "ques_list")
+    assert cache.headers(key) == {}
+    cache.resolve(key, response(b"a", ETag='"1"', **{"Last-Modified": "then"}), parses)
+    assert cache.headers(key) == {
+        "If-None-Match": '"1"',
+        "If-Modified-Since": "then",
+    }
+    assert cache.resolve(key, response(b"", status_code=304), parses) == "a"
+    assert cache.not_modified == 1
+    assert parses.calls == [b"a"]
+
+
+def test_least_recently_used_is_evicted(parses):
+    cache = ResponseCache(maxsize=2)
+    for endpoint in ("a", "b"):
+        cache.resolve(cache.key("GET", endpoint), response(b"x"), parses)
+    cache.resolve(cache.key("GET", "a"), response(b"x"), parses)
+    cache.resolve(cache.key("GET", "c"), response(b"x"), parses)
+    assert list(cache.entries) == [cache.key("GET", "a"), cache.key("GET", "c")]
+
+
+def test_reset():
+    cache = ResponseCache()
+    cache.resolve(cache.key("GET", "a"), response(b"x"), lambda r: None)
+    cache.reset()
+    assert cache.as_dict() == {
+        "hits": 0,
+        "not_modified": 0,
+        "misses": 0,
+        "hit_rate": 0.0,
+        "entries": 0,
+    }
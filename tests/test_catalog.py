@@ -0,0 +1,30 @@
+def test_index_is_reused_within_ttl(student, server):
+    index = student.catalog.index("GE")
+    assert index["0349"].vacant
+    requests = server.state.requests
+    assert student.catalog.index("GE") is index
+    assert server.state.requests == requests
+
+
+def test_refresh_reports_changed_rows(student, server):
+    student.catalog.index("GE")
+    assert student.catalog.refresh("GE") == []
+
+    server.state.courses["0349"][3] += 1
+    [change] = student.catalog.refresh("GE")
+    assert change.code == "0349"
+    assert change.before.vacant and not change.after.vacant
+    assert not student.catalog.index("GE")["0349"].vacant
+
+
+def test_refresh_reports_removed_rows(student, server):
+    student.catalog.index("GE")
+    del server.state.courses["0412"]
+    [change] = student.catalog.refresh("GE")
+    assert (change.code, change.after) == ("0412", None)
+    assert "0412" not in student.catalog.index("GE")
+
+
+def test_lists_are_kept_apart(student):
+    assert "1159" in student.catalog.index("ACAD")
+    assert "1159" not in student.catalog.index("GE")
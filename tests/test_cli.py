@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+import nchu
+from nchu import cli
+
+
+@pytest.fixture
+def run(server, account, monkeypatch, capsys):
+    """Run the CLI, return its exit status and the records it printed"""
+    monkeypatch.setenv("NCHU_USERNAME", account[0])
+    monkeypatch.setenv("NCHU_PASSWORD", account[1])
+    # Closed functions fail at once
+    monkeypatch.setattr(nchu.RetryPolicy, "delay", lambda self, attempt: 0)
+
+    def run(*argv):
+        status = cli.main([*argv, "--no-session"])
+        out = capsys.readouterr().out
+        return status, [json.loads(line) for line in out.splitlines()]
+
+    return run
+
+
+def test_seats(run):
+    status, records = run("seats", "0349", "9999")
+    assert status == 1
+    assert records == [
+        {
+            "code": "0349",
+            "found": True,
+            "available": 60,
+            "selected": 59,
+            "vacant": True,
+        },
+        {"code": "9999", "found": False},
+    ]
+
+
+def test_add_and_drop(run):
+    status, records = run("add", "0501", "1159")
+    assert status == 1
+    assert [record["outcome"] for record in records] == ["added", "full"]
+    status, records = run("drop", "0501")
+    assert (status, records[0]["outcome"]) == (0, "dropped")
+
+
+def test_drop_reports_every_code(run, server, monkeypatch):
+    server.state.enrolled.add("0501")
+    # Before each code after the first: no answer to the drop, then closed
+    breakdowns = [
+        lambda: server.state.failing.update(enro_del3_drop=502),
+        lambda: server.state.closed.add("enro_del2_check"),
+        lambda: None,
+    ]
+    remove_course = nchu.Student.remove_course
+
+    def breaking(self, code):
+        try:
+            return remove_course(self, code)
+        finally:
+            breakdowns.pop(0)()
+
+    monkeypatch.setattr(nchu.Student, "remove_course", breaking)
+    status, records = run("drop", "0348", "1160", "0501")
+    assert status == 1
+    assert [(record["code"], record["outcome"]) for record in records] == [
+        ("0348", "dropped"),
+        ("1160", "unknown"),
+        ("0501", "closed"),
+    ]
+
+
+def test_swap_as_json_array(run, capsys):
+    status = cli.main(["swap", "0348", "0349", "--json", "--no-session"])
+    [record] = json.loads(capsys.readouterr().out)
+    assert (status, record["swapped"]) == (0, True)
+
+
+def test_fill_all(run):
+    status, records = run("questionnaire", "fill-all")
+    assert status == 0
+    assert len(records) == 3
+    assert all(record["filled"] for record in records)
+
+
+def test_wrong_password(run, monkeypatch):
+    monkeypatch.setenv("NCHU_PASSWORD", "wrong")
+    assert run("seats", "0349") == (
+        2,
+        [{"error": "ValueError", "message": "Incorrect password"}],
+    )
+
+
+def test_closed_function_is_an_error_record(run, server):
+    server.state.closed.add("enro_direct2_chk")
+    status, [record] = run("add", "0501")
+    assert (status, record["error"]) == (1, "FunctionClosedError")
+
+
+def test_missing_credentials(run, monkeypatch, tmp_path):
+    monkeypatch.delenv("NCHU_PASSWORD")
+    monkeypatch.setenv("NCHU_CREDENTIALS", str(tmp_path / "missing.json"))
+    status, [record] = run("seats", "0349")
+    assert (status, record["error"]) == (2, "CredentialsError")
+
+
+def test_credentials_file(tmp_path, account):
+    path = tmp_path / "credentials.json"
+    path.write_text(json.dumps({account[0]: account[1], "4107056001": "other"}))
+    assert cli.load_credentials(path, account[0]) == account
+    with pytest.raises(cli.CredentialsError):
+        cli.load_credentials(path, "4107056002")
@@ -0,0 +1,45 @@
+import pytest
+
+from nchu import Student
+from nchu.course import CourseIndex
+
+
+def test_course_index(page, state):
+    check = page("enro_direct2_chk", V_WANT=["0349", "1159", "9999"])
+    index = CourseIndex.from_page(check, "CODE")
+    assert len(index) == 2
+    assert "9999" not in index
+    assert index.secret("0349") == state.secret("0349")
+    assert index["0349"].seats.vacant
+    assert not index["1159"].vacant
+    assert (index["1159"].available, index["1159"].selected) == (40, 40)
+
+
+def test_course_index_update_returns_changed(page, state):
+    index = CourseIndex("CODE")
+    assert index.update(page("enro_direct2_chk", V_WANT=["0349", "1159"])) == [
+        "0349",
+        "1159",
+    ]
+    state.courses["0349"][3] += 1
+    assert index.update(page("enro_direct2_chk", V_WANT=["0349", "1159"])) == ["0349"]
+    assert not index["0349"].vacant
+
+
+@pytest.mark.parametrize("method", ["GE", "ACAD"])
+def test_course_index_of_lists(page, state, method):
+    name = "gned_add2_list" if method == "GE" else "enro_nomo1_list"
+    index = CourseIndex.from_page(page(name), method)
+    expected = {
+        code
+        for code, course in state.courses.items()
+        if (course[4] == "DEPT") == (method == "ACAD")
+    }
+    assert {course.code for course in index} == expected
+
+
+def test_acad_get_df(render, state):
+    pytest.importorskip("pandas")
+    df = Student.acad_get_df(render("enro_nomo1_list"))
+    assert "1159" in df.index
+    assert df.loc["1159", "secret"] == state.secret("1159")
@@ -0,0 +1,64 @@
+from nchu.metrics import MetricsCollector, RequestEvent
+
+
+def event(endpoint="direct_check", status=200, elapsed=0.2, attempt=0, **kwargs):
+    fields = dict(
+        username="4107056000",
+        endpoint=endpoint,
+        method="POST",
+        status=status,
+        bytes=2000,
+        elapsed=elapsed,
+        queued=0.0,
+        attempt=attempt,
+        outcome="ok" if status else "error",
+    )
+    fields.update(kwargs)
+    return RequestEvent(**fields)
+
+
+def samples(text):
+    """Sample lines of Prometheus text as {name{labels}: value}"""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+def test_to_prometheus():
+    metrics = MetricsCollector()
+    metrics(event(elapsed=0.04))
+    metrics(event(elapsed=0.3, attempt=1, queued=0.5))
+    metrics(event(status=None, elapsed=7))
+    text = metrics.to_prometheus()
+    assert text.endswith("\n")
+    assert "# TYPE nchu_request_seconds histogram" in text
+    values = samples(text)
+    assert values['nchu_requests_total{endpoint="direct_check",outcome="ok"}'] == 2
+    assert values['nchu_requests_total{endpoint="direct_check",outcome="error"}'] == 1
+    assert values['nchu_retries_total{endpoint="direct_check"}'] == 1
+    assert values['nchu_queued_seconds_total{endpoint="direct_check"}'] == 0.5
+
+    bucket = 'nchu_request_seconds_bucket{endpoint="direct_check",le="%s"}'
+    assert values[bucket % "0.05"] == 1
+    assert values[bucket % "0.5"] == 2
+    assert values[bucket % "10.0"] == 3
+    assert values[bucket % "+Inf"] == 3
+    assert values['nchu_request_seconds_count{endpoint="direct_check"}'] == 3
+    # Failed requests have no response to measure
+    assert values['nchu_response_bytes_count{endpoint="direct_check"}'] == 2
+
+
+def test_prefix_and_empty():
+    text = MetricsCollector().to_prometheus(prefix="acad")
+    assert samples(text) == {}
+    assert "# TYPE acad_requests_total counter" in text
+
+
+def test_as_dict_matches():
+    metrics = MetricsCollector()
+    metrics(event())
+    metrics(event(endpoint="direct_final"))
+    assert set(metrics.as_dict()) == {"direct_check", "direct_final"}
+    assert metrics.as_dict()["direct_final"]["requests"] == {"ok": 1}
@@ -0,0 +1,93 @@
+import asyncio
+import json
+from datetime import datetime
+
+from nchu.aio import AsyncStudent, Pool
+from nchu.monitor import AdaptiveInterval, Monitor, Notifier, WatchList
+
+
+class Events(list):
+    async def __call__(self, event):
+        self.append(event)
+
+
+async def monitored(tmp_path, account, codes, until, interval=0.05, add=True):
+    """Run a Monitor over codes until until(monitor), return its events"""
+    path = tmp_path / "watch.json"
+    path.write_text(json.dumps(codes))
+    events = Events()
+    async with Pool(max_connections=2) as pool:
+        student = await AsyncStudent.login(*account, pool=pool)
+        monitor = Monitor(
+            student,
+            WatchList(path),
+            tmp_path / "state.json",
+            Notifier([events]),
+            AdaptiveInterval(interval, interval, interval, peak_hours=range(24)),
+            add=add,
+        )
+
+        async def stop():
+            while not until(monitor):
+                await asyncio.sleep(0.02)
+            monitor.stop()
+
+        await asyncio.wait_for(asyncio.gather(monitor.run(), stop()), 10)
+    return monitor, events
+
+
+def test_interval_follows_changes():
+    interval = AdaptiveInterval(60, 10, 600, peak_hours=range(24))
+    assert interval.update(True) == 30
+    assert interval.update(False) == 45
+    assert interval.update(True) == 22.5
+    interval = AdaptiveInterval(60, 10, 600, peak_hours=range(8, 23))
+    assert interval.current(datetime(2021, 2, 22, 12)) == 60
+    assert interval.current(datetime(2021, 2, 22, 3)) == 240
+
+
+def test_freed_seat_is_added(tmp_path, server, account):
+    async def main():
+        async def free():
+            await asyncio.sleep(0.2)
+            server.state.courses["0412"][3] -= 1
+
+        task = asyncio.ensure_future(free())
+        result = await monitored(
+            tmp_path, account, ["0412", "1159"], lambda m: "0412" in m.added
+        )
+        await task
+        return result
+
+    monitor, events = asyncio.run(main())
+    assert [(event.kind, event.code) for event in events] == [
+        ("vacant", "0412"),
+        ("added", "0412"),
+    ]
+    assert json.loads((tmp_path / "watch.json").read_text()) == ["1159"]
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state["added"] == ["0412"]
+
+
+def test_watch_file_is_reloaded_between_polls(tmp_path, server, account):
+    async def main():
+        async def edit():
+            await asyncio.sleep(0.3)
+            (tmp_path / "watch.json").write_text(json.dumps(["1159", "0349"]))
+
+        task = asyncio.ensure_future(edit())
+        # Polls ten minutes apart, the new code is seen long before that
+        result = await monitored(
+            tmp_path,
+            account,
+            ["1159"],
+            lambda m: "0349" in m.seats,
+            interval=600,
+            add=False,
+        )
+        await task
+        return result
+
+    monitor, events = asyncio.run(main())
+    assert monitor.watching == ["1159", "0349"]
+    assert ("vacant", "0349") in [(event.kind, event.code) for event in events]
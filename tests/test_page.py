@@ -0,0 +1,54 @@
+from nchu.course import CODE_COLUMN
+
+
+def test_forms(page):
+    sso = page("sso_entry")
+    assert len(sso.forms) == 1
+    assert sso.attr(sso.forms[0], "action").startswith("http://acad.test/nidp/app/")
+
+
+def test_inputs(page, state):
+    # Named in upper case, next to an unnamed submit button
+    confirm = page("gned_add3_check", v_click=state.secret("0349"))
+    assert confirm.inputs == {"v_click": "C" + state.secret("0349")}
+
+
+def test_hidden_inputs(page):
+    sso = page("sso_entry")
+    assert sso.hidden_inputs() == {
+        "option": "credential",
+        "target": "http://acad.test/portal/",
+    }
+
+    ta_list = page("ta_ques_stu")
+    forms = [
+        ta_list.hidden_inputs(form) for form in ta_list.find_all(ta_list.root, "form")
+    ]
+    assert [form["v_ta"] for form in forms] == ["助教甲", "助教乙", "助教丙"]
+    assert forms[0]["v_scrd_serial_no"] == "1160"
+
+
+def test_input_names(page):
+    fill = page("Stud_Question_Fill2", v_serial="1160")
+    assert fill.input_names("radio") == ["v_A1", "v_A2", "v_A3", "v_B10"]
+    assert fill.input_names("text") == ["v_C1"]
+    assert fill.hidden_inputs() == {"v_serial": "1160", "v_year": "1092"}
+
+
+def test_rows_and_cells(page, state):
+    drop_list = page("enro_del1_list")
+    rows = [drop_list.find_all(row, "td") for row in drop_list.rows(form=0)]
+    codes = {drop_list.text(cells[CODE_COLUMN]) for cells in rows if cells}
+    assert state.enrolled <= codes
+    assert len(drop_list.cells(form=0)) == sum(map(len, rows))
+
+
+def test_iter_rows_matches_rows(page):
+    ques = page("Stud_Question_Main1")
+    streamed = [ques.text(row) for _, row in ques.iter_rows(tables=[2])]
+    assert streamed == [ques.text(row) for row in ques.rows(table=2)]
+
+
+def test_header(page):
+    ques = page("Stud_Question_Main1")
+    assert "選課號碼" in ques.header(table=2)
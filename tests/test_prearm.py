@@ -0,0 +1,57 @@
+import threading
+from time import time
+
+import pytest
+
+from nchu import Outcome, prearm
+from nchu.prearm import ClockOffset, PreArmedAdd
+
+DIRECT_PAGES = {"enro_direct1_list", "enro_direct2_chk", "enro_direct3_dml"}
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    """Skip measuring the clock offset, the mock shares the local clock"""
+    monkeypatch.setattr(
+        prearm, "estimate_clock_offset", lambda student: ClockOffset(0, 0, 0)
+    )
+
+
+def outcomes(report):
+    return {result.code: result.outcome for result in report.results}
+
+
+def test_clock_offset_of_local_server(student):
+    clock = prearm.estimate_clock_offset(student, samples=4)
+    assert abs(clock.offset) <= clock.error + 0.1
+    assert clock.error <= 1
+
+
+def test_prepared_finals_skip_unknown_codes(student, server, synced):
+    armed = PreArmedAdd(student, ["0501", "9999"]).arm()
+    assert armed.finals == [(["0501"], armed.finals[0][1])]
+    report = armed.fire_at(time() + 0.2, warmup=0.1)
+    assert outcomes(report) == {"0501": Outcome.ADDED, "9999": Outcome.NOT_FOUND}
+    assert [landing.endpoint for landing in report.landings] == ["direct_final"]
+
+
+def test_closed_until_open(student, server, synced):
+    server.state.closed |= DIRECT_PAGES
+    armed = PreArmedAdd(student, ["0501", "9999"], spacing=0.02).arm()
+    assert armed.finals == []
+    target = time() + 0.3
+    threading.Timer(0.5, server.state.closed.difference_update, [DIRECT_PAGES]).start()
+    report = armed.fire_at(target, warmup=0.1)
+    assert outcomes(report) == {"0501": Outcome.ADDED, "9999": Outcome.NOT_FOUND}
+    assert any(landing.outcome == "closed" for landing in report.landings)
+
+
+def test_server_error_on_final_is_unknown(student, server, synced, monkeypatch):
+    monkeypatch.setattr(prearm, "DIRECT_BATCH_SIZE", 1)
+    armed = PreArmedAdd(student, ["0501", "1161"]).arm()
+    server.state.failing["enro_direct3_dml"] = 502
+    report = armed.fire_at(time() + 0.2, warmup=0.1)
+    assert outcomes(report) == {"0501": Outcome.UNKNOWN, "1161": Outcome.UNKNOWN}
+    # Not sent again, the first one went through
+    assert len(report.landings) == 2
+    assert "0501" in server.state.enrolled
@@ -0,0 +1,44 @@
+from string import Template
+
+import mock_server
+import pytest
+
+import nchu
+from nchu import FunctionClosedError, RetryPolicy
+
+
+def test_fill_all_questionnaires(student, server):
+    report = student.fill_all_questionnaires()
+    assert all(result.filled and result.error is None for result in report)
+    assert server.state.ques_done == set(mock_server.QUESTIONNAIRES)
+    assert student.fill_all_questionnaires() == []
+
+
+def test_fill_all_ta_questionnaires(student, server):
+    report = student.fill_all_ta_questionnaires()
+    assert [result.questionnaire["v_ta"] for result in report] == [
+        "助教甲",
+        "助教乙",
+        "助教丙",
+    ]
+    assert all(result.filled for result in report)
+    assert len(server.state.ta_done) == 3
+    assert student.fill_all_ta_questionnaires() == []
+
+
+def test_ta_forms_do_not_depend_on_the_header(student, server, monkeypatch):
+    fixture = mock_server.fixture
+
+    def renamed(name):
+        template = fixture(name).template
+        return Template(template.replace("<TH>TA意見調查</TH>", "<TH>TA評量</TH>"))
+
+    monkeypatch.setattr(mock_server, "fixture", renamed)
+    assert len(student.fill_all_ta_questionnaires()) == 3
+
+
+def test_closed_list_is_raised(server, account):
+    student = nchu.Student(*account, retry=RetryPolicy(retries=1, backoff=0))
+    server.state.closed.add("Stud_Question_Main1")
+    with pytest.raises(FunctionClosedError):
+        student.fill_all_questionnaires()
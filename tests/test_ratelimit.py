@@ -0,0 +1,50 @@
+import pytest
+
+from nchu import ratelimit
+from nchu.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time of the ratelimit module, advanced only by its sleep()"""
+    clock = [0.0]
+    monkeypatch.setattr(ratelimit, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(
+        ratelimit, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+    )
+    return clock
+
+
+def test_token_bucket_burst_then_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock[0] == 0
+    bucket.acquire()
+    assert clock[0] == pytest.approx(0.5)
+    bucket.acquire()
+    assert clock[0] == pytest.approx(1.0)
+
+
+def test_token_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock[0] += 60
+    for _ in range(2):
+        bucket.acquire()
+    assert clock[0] == 60
+    bucket.acquire()
+    assert clock[0] == pytest.approx(60.1)
+
+
+def test_rate_limiter_endpoint_bucket(clock):
+    limiter = RateLimiter(endpoints={"direct_check": (1, 1)})
+    for _ in range(3):
+        with limiter.limit("direct_list"):
+            pass
+    assert clock[0] == 0
+    for _ in range(3):
+        with limiter.limit("direct_check"):
+            pass
+    assert clock[0] == pytest.approx(2)
@@ -0,0 +1,47 @@
+import pytest
+
+from nchu import CLOSED_MARKER, EXPIRED_MARKERS, CourseResult, Outcome, _results
+
+
+@pytest.mark.parametrize(
+    "message, outcome",
+    [
+        ("加選成功", Outcome.ADDED),
+        ("退選成功", Outcome.DROPPED),
+        ("選課人數已額滿，加選失敗", Outcome.FULL),
+        ("上課時間衝堂，加選失敗", Outcome.CONFLICT),
+        ("已選過此課程，加選失敗", Outcome.DUPLICATE),
+        ("查無此選課號碼", Outcome.NOT_FOUND),
+        ("未選此課程，退選失敗", Outcome.NOT_ENROLLED),
+        ("超過學分上限，加選失敗", Outcome.CREDIT_LIMIT),
+        (CLOSED_MARKER, Outcome.CLOSED),
+        *((marker, Outcome.EXPIRED) for marker in EXPIRED_MARKERS),
+        ("", Outcome.UNKNOWN),
+        ("系統忙碌中", Outcome.UNKNOWN),
+    ],
+)
+def test_outcome_of(message, outcome):
+    assert Outcome.of(message) is outcome
+
+
+def test_outcome_kinds():
+    assert {outcome for outcome in Outcome if outcome.ok} == {
+        Outcome.ADDED,
+        Outcome.DROPPED,
+    }
+    assert not Outcome.FULL.hopeless
+    assert Outcome.CONFLICT.hopeless
+    assert not Outcome.UNKNOWN.hopeless
+
+
+def test_results(page, state):
+    final = page(
+        "enro_direct3_dml",
+        v_tick=[state.secret(code) for code in ("0501", "1159", "0348")],
+    )
+    assert _results(final, ["0501", "1159", "0348", "9999"]) == [
+        CourseResult("0501", Outcome.ADDED, "加選成功"),
+        CourseResult("1159", Outcome.FULL, "選課人數已額滿，加選失敗"),
+        CourseResult("0348", Outcome.DUPLICATE, "已選過此課程，加選失敗"),
+        CourseResult("9999", Outcome.UNKNOWN, ""),
+    ]
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from nchu import RetryPolicy
+
+
+def test_retry_policy_without_jitter():
+    policy = RetryPolicy(backoff=0.5, max_backoff=3, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [0.5, 1, 2, 3, 3]
+
+
+def test_retry_policy_jitter_only_shortens():
+    policy = RetryPolicy(backoff=1, max_backoff=30, jitter=0.5)
+    delays = [policy.delay(2) for _ in range(200)]
+    assert all(2 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_concurrent_relogin_happens_once(student, server):
+    student.get_seat_status(["0349"])
+    server.state.exclusive = True
+    server.expire_sessions()
+    logins = server.state.logins
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(
+            executor.map(lambda _: student.get_seat_status(["0349"]), range(8))
+        )
+    assert all(status["0349"].vacant for status in statuses)
+    assert server.state.logins == logins + 1
@@ -0,0 +1,47 @@
+from time import monotonic, sleep
+
+from nchu import Outcome, scheduler
+from nchu.scheduler import Scheduler, WatchJob
+
+
+class Sleep:
+    repeat = False
+    interval = 0
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, student):
+        sleep(self.seconds)
+        return student
+
+
+def test_busy_workers_are_waited_for(monkeypatch):
+    calls = []
+    real_wait = scheduler.wait
+    monkeypatch.setattr(
+        scheduler,
+        "wait",
+        lambda *args, **kwargs: calls.append(1) or real_wait(*args, **kwargs),
+    )
+    monkeypatch.setattr(Scheduler, "student", lambda self, username: username)
+    jobs = Scheduler([("a", "-"), ("b", "-")], max_workers=1)
+    for username in ("a", "b"):
+        jobs.add_job(username, Sleep(0.2))
+        jobs.add_job(username, Sleep(0.2))
+    start = monotonic()
+    results = jobs.run(timeout=5)
+    assert monotonic() - start < 2
+    assert [result.result for result in results] == ["a", "b", "a", "b"]
+    assert len(calls) <= 8
+
+
+def test_watch_job_on_mock(server, account):
+    jobs = Scheduler([account], max_workers=2)
+    jobs.add_job(account[0], WatchJob(["0501", "1159"], interval=60))
+    jobs.run(timeout=1)
+    [result] = jobs.results
+    assert result.error is None
+    assert result.result["0501"].outcome is Outcome.ADDED
+    assert result.result["1159"].outcome is Outcome.FULL
+    assert "0501" in server.state.enrolled
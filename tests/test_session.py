@@ -0,0 +1,53 @@
+import json
+import os
+import stat
+
+import nchu
+from nchu.session import SessionStore
+
+
+def logins(server):
+    """ACAD logins served so far"""
+    return len(server.state.sessions)
+
+
+def login(account, store):
+    student = nchu.Student(*account, session_store=store)
+    student.get_seat_status(["0349"])
+    return student
+
+
+def test_store_round_trip(tmp_path, student):
+    student.get_seat_status(["0349"])
+    store = SessionStore(tmp_path)
+    store.save(student.username, student.session.cookies)
+    mode = os.stat(store.path(student.username)).st_mode
+    assert stat.S_IMODE(mode) == 0o600
+    cookies = store.load(student.username)
+    assert {cookie["name"] for cookie in cookies} >= {"ACADSESSION"}
+    assert SessionStore(tmp_path, max_age=-1).load(student.username) is None
+    store.delete(student.username)
+    assert store.load(student.username) is None
+
+
+def test_restored_session_skips_login(tmp_path, server, account):
+    store = SessionStore(tmp_path)
+    login(account, store)
+    login(account, store)
+    assert logins(server) == 1
+
+
+def test_expired_session_logs_in(tmp_path, server, account):
+    store = SessionStore(tmp_path)
+    login(account, store)
+    server.expire_sessions()
+    login(account, store)
+    assert logins(server) == 1
+
+
+def test_broken_record_logs_in(tmp_path, server, account):
+    store = SessionStore(tmp_path)
+    tmp_path.joinpath(f"{account[0]}.json").write_text(json.dumps({"cookies": 1}))
+    assert store.load(account[0]) is None
+    login(account, store)
+    assert logins(server) == 1
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from nchu.monitor import AdaptiveInterval, Notifier, ShardedMonitor, WatchList, _shard
+
+
+class Events(list):
+    async def __call__(self, event):
+        self.append(event)
+
+
+def sharded(tmp_path, accounts, codes, events, workers=2):
+    path = tmp_path / "watch.json"
+    path.write_text(json.dumps(codes))
+    return ShardedMonitor(
+        accounts,
+        WatchList(path),
+        tmp_path / "state.json",
+        workers=workers,
+        notifier=Notifier([events]),
+        interval=AdaptiveInterval(0.05, 0.05, 0.05, peak_hours=range(24)),
+    )
+
+
+async def run_until(monitor, done, timeout=10):
+    async def stop():
+        while not done():
+            await asyncio.sleep(0.05)
+        monitor.stop()
+
+    await asyncio.wait_for(asyncio.gather(monitor.run(), stop()), timeout)
+
+
+def test_shards_are_stable():
+    assert [_shard(code, 4) for code in ("0349", "1159")] == [
+        _shard(code, 4) for code in ("0349", "1159")
+    ]
+    codes = [str(code) for code in range(2000, 2400)]
+    sizes = [sum(_shard(code, 4) == shard for code in codes) for shard in range(4)]
+    assert min(sizes) > 50
+
+
+def test_refused_worker_is_not_respawned(tmp_path, server, account):
+    server.state.courses["0412"][3] = 79
+    events = Events()
+    monitor = sharded(
+        tmp_path, [account, (account[0], "wrong")], ["0412", "1159", "1160"], events
+    )
+    asyncio.run(run_until(monitor, lambda: "0412" in monitor.added))
+    assert list(monitor.processes) == [0]
+    assert monitor.respawns == [0, 0]
+    assert monitor.shards[0] == ["1159", "1160"]
+    assert any("Incorrect password" in event.message for event in events)
+
+
+def test_stops_when_every_worker_died(tmp_path, server, account):
+    events = Events()
+    monitor = sharded(tmp_path, [(account[0], "wrong")], ["0412", "1159"], events)
+
+    async def main():
+        run = asyncio.ensure_future(asyncio.wait_for(monitor.run(), 10))
+        # A watch list change while the workers die must not reach _assign
+        await asyncio.sleep(0.2)
+        monitor.watch.save(["0412"])
+        await run
+
+    asyncio.run(main())
+    assert monitor.processes == {}
+    assert events[-1].message == "Every worker died, stopping"
+
+
+def test_nothing_to_assign_without_workers(tmp_path):
+    monitor = sharded(tmp_path, [("4107056000", "-")], ["0412"], Events())
+    monitor.watch.reload()
+    monitor.commands = [None, None]
+    monitor._assign()
+    assert monitor.shards == [None, None]
@@ -0,0 +1,40 @@
+import pytest
+
+from nchu import EnrollmentError, Outcome, SwapError
+
+
+def test_swap(student, server):
+    result = student.swap_course("0348", "0349")
+    assert result.swapped
+    assert result.rollback is None
+    assert "0349" in server.state.enrolled
+    assert "0348" not in server.state.enrolled
+
+
+def test_full_add_is_rolled_back(student, server):
+    result = student.swap_course("0348", "1159")
+    assert not result.swapped
+    assert result.rollback == "加選成功"
+    assert "0348" in server.state.enrolled
+
+
+def test_not_enrolled(student, server):
+    with pytest.raises(EnrollmentError) as error:
+        student.swap_course("0501", "0349")
+    assert error.value.outcome is Outcome.NOT_ENROLLED
+
+
+def test_unknown_add_is_refused_before_dropping(student, server):
+    with pytest.raises(EnrollmentError) as error:
+        student.swap_course("0348", "9999")
+    assert error.value.outcome is Outcome.NOT_FOUND
+    assert "0348" in server.state.enrolled
+
+
+def test_add_without_answer_is_not_rolled_back(student, server):
+    server.state.stalled["enro_direct3_dml"] = 1
+    student.transport.timeout = (5, 0.5)
+    with pytest.raises(SwapError) as error:
+        student.swap_course("0348", "0349")
+    assert error.value.result.rollback is None
+    assert "0349" in server.state.enrolled
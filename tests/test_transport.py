@@ -0,0 +1,33 @@
+import socket
+
+import pytest
+import requests
+
+from nchu.transport import KEEPALIVE_IDLE, Transport
+
+
+def test_keepalive_probe_timings(server):
+    session = requests.Session()
+    adapter = Transport().mount(session)
+    assert session.get(server.url + "/_requests").ok
+    [key] = adapter.poolmanager.pools.keys()
+    pool = adapter.poolmanager.pools[key]
+    [sock] = [conn.sock for conn in pool.pool.queue if conn]
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        idle = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE)
+        assert idle == KEEPALIVE_IDLE
+
+
+def test_http2_adapter_honors_session_settings(server):
+    pytest.importorskip("httpx")
+    session = requests.Session()
+    adapter = Transport(http2=True).mount(session)
+    plain = session.get(server.url).content
+    streamed = session.get(server.url, stream=True)
+    assert b"".join(streamed.iter_content(7)) == plain
+    with pytest.raises(requests.ConnectionError):
+        session.get(server.url, proxies={"http": "http://127.0.0.1:9"})
+    session.get(server.url, verify=False)
+    assert len(adapter.clients) == 3
+    adapter.close()